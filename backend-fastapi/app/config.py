@@ -25,6 +25,52 @@ class Settings(BaseSettings):
     def cors_origins_list(self) -> List[str]:
         return [origin.strip() for origin in self.cors_origins.split(",")]
 
+    # Local storage (cache upload, dll)
+    data_dir: str = os.path.join(project_root, "data")
+
+    # Upload Configuration
+    dimension_cache_ttl: int = 300
+    # "rest" (PostgREST) atau "copy" (COPY lewat DATABASE_URL)
+    upload_backend: str = "rest"
+    copy_chunk_rows: int = 50000
+    insert_batch_size: int = 500
+    insert_concurrency: int = 4
+    insert_max_retries: int = 3
+    insert_retry_backoff: float = 0.5
+    upload_max_concurrent_jobs: int = 2
+    upload_jobs_retained: int = 200
+    upload_cache_max_mb: int = 512
+    # Preview cepat memulai cleaning penuh di background hanya untuk file
+    # sampai ukuran ini (0 = tidak pernah)
+    preview_warm_max_mb: int = 10
+    # Area header yang dicari untuk label metadata (Retailer, dll)
+    metadata_scan_rows: int = 20
+    metadata_scan_cols: int = 20
+    metadata_full_scan: bool = False
+    # Kemiripan minimum (Dice trigram, 0-1) untuk normalisasi nama kota
+    city_match_threshold: float = 0.5
+    # Buat otomatis product/retailer yang belum ada saat upload
+    create_unknown_dimensions: bool = True
+    # City baru ikut dibuat (opt-in); ejaan mirip dalam satu file digabung dulu
+    create_unknown_cities: bool = False
+    # Index hash dicocokkan ulang dengan tabel transaction (jumlah baris dan
+    # id terbesar) paling lama setiap N detik (0 = setiap upload)
+    row_hash_index_check_seconds: int = 60
+
+    # Analytics store di-sync incremental saat dibaca kalau sync terakhir
+    # lebih lama dari N detik (0 = hanya lewat POST /analytics/sync)
+    analytics_store_max_age: int = 300
+
+    # Export
+    export_batch_rows: int = 50000
+    # Pagination /analytics/transactions (JSON); Arrow stream tanpa batas
+    page_default_rows: int = 1000
+    page_max_rows: int = 10000
+
+    # Batch forecasting (0 = jumlah core CPU / dua kali jumlah worker)
+    forecast_workers: int = 0
+    forecast_partitions: int = 0
+
     # Server Configuration
     host: str = "127.0.0.1"
     port: int = 8000
@@ -1,7 +1,7 @@
 import os
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import sessionmaker, declarative_base
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, make_url
 from .config import settings
 
 # Support PostgreSQL from Supabase
@@ -44,6 +44,22 @@ else:
 
 Base = declarative_base()
 
+_bulk_engine = None
+
+
+def get_bulk_engine():
+    """Engine sync untuk bulk load (COPY butuh koneksi DBAPI sync, bukan asyncpg)"""
+    global _bulk_engine
+    if _bulk_engine is None:
+        if is_async:
+            url = make_url(settings.database_url).set(drivername="postgresql+psycopg")
+            # pgbouncer=true hanya dipahami Supabase client, bukan libpq
+            url = url.difference_update_query(["pgbouncer"])
+            _bulk_engine = create_engine(url, pool_pre_ping=True)
+        else:
+            _bulk_engine = engine
+    return _bulk_engine
+
 
 def init_db():
     """Initialize database"""
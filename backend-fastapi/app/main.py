@@ -1,7 +1,7 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from .config import settings
-from .routers import adidas_router
+from .routers import adidas_router, analytics_router, forecast_router
 
 app = FastAPI(
     title=settings.app_name,
@@ -12,6 +12,8 @@ app = FastAPI(
     ## Features:
     - **Data Upload** - Upload dan cleaning data Excel menggunakan Polars
     - **Preview** - Preview data sebelum upload
+    - **Analytics** - Salinan lokal transaksi (Parquet) untuk query analitik
+    - **Forecasting** - Batch forecast semua series retailer x product x method
     
     ## Tech Stack:
     - FastAPI (Python web framework)
@@ -56,5 +58,7 @@ async def health_check():
 
 # Include routers
 app.include_router(adidas_router)
+app.include_router(analytics_router)
+app.include_router(forecast_router)
 
 # Run with: uvicorn app.main:app --reload --host 0.0.0.0 --port 8000
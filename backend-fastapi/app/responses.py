@@ -0,0 +1,68 @@
+import orjson
+import polars as pl
+from typing import Any
+from fastapi.responses import JSONResponse
+
+_ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, pl.Series):
+        return value.to_list()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def _iso_datetimes(df: pl.DataFrame) -> pl.DataFrame:
+    """
+    write_json menulis Datetime tanpa zona sebagai "2024-01-01 05:00:00";
+    samakan dengan datetime.isoformat() yang dipakai orjson/jsonable_encoder
+    """
+    exprs = []
+    for name, dtype in df.schema.items():
+        if isinstance(dtype, pl.Datetime) and dtype.time_zone is None:
+            col = pl.col(name)
+            exprs.append(
+                pl.when(col.dt.microsecond() == 0)
+                .then(col.dt.to_string("%Y-%m-%dT%H:%M:%S"))
+                .otherwise(col.dt.to_string("%Y-%m-%dT%H:%M:%S%.6f"))
+                .alias(name)
+            )
+    return df.with_columns(exprs) if exprs else df
+
+
+def encode_json(value: Any) -> bytes:
+    """
+    JSON bytes untuk response
+    - DataFrame ditulis langsung oleh Polars (write_json, array of records)
+      tanpa lewat list of dicts
+    - Nilai lain lewat orjson (date/datetime/float native)
+    """
+    if isinstance(value, pl.LazyFrame):
+        value = value.collect()
+    if isinstance(value, pl.DataFrame):
+        return _iso_datetimes(value).write_json().encode()
+    if isinstance(value, dict):
+        if not any(
+            isinstance(v, (dict, pl.DataFrame, pl.LazyFrame)) for v in value.values()
+        ):
+            return orjson.dumps(value, default=_default, option=_ORJSON_OPTIONS)
+        return (
+            b"{"
+            + b",".join(
+                orjson.dumps(str(k)) + b":" + encode_json(v) for k, v in value.items()
+            )
+            + b"}"
+        )
+    return orjson.dumps(value, default=_default, option=_ORJSON_OPTIONS)
+
+
+class PolarsJSONResponse(JSONResponse):
+    """
+    JSONResponse yang menerima DataFrame di dalam content
+    Contoh: return PolarsJSONResponse({"status": "success", "data": df})
+    Kembalikan instance-nya langsung dari route supaya FastAPI tidak
+    menjalankan jsonable_encoder dulu
+    """
+
+    def render(self, content: Any) -> bytes:
+        return encode_json(content)
@@ -1 +1,3 @@
 from .adidas import router as adidas_router
+from .analytics import router as analytics_router
+from .forecast import router as forecast_router
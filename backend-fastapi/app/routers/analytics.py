@@ -0,0 +1,352 @@
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.background import BackgroundTask
+import asyncio
+import os
+import tempfile
+from datetime import date
+from typing import Iterator, List, Optional, Tuple
+import polars as pl
+from app.config import settings
+from app.responses import PolarsJSONResponse
+from app.services.analytics_store import PAGE_KEYS, STORE_SCHEMA, analytics_store
+from app.services.dimension_cache import dimension_cache
+from app.services.polars_service import PolarsDataProcessor
+from app.services.sales_summary import sales_summary
+from app.services.transaction_mapper import DIMENSIONS
+
+router = APIRouter(
+    prefix="/api/v1/analytics",
+    tags=["Analytics"],
+    default_response_class=PolarsJSONResponse,
+)
+
+
+@router.post("/sync")
+async def sync_analytics_store(full: bool = False):
+    """
+    Sinkronkan analytics store lokal (Parquet) dengan tabel transaction
+    - Default: hanya transaksi dengan created_at sejak watermark terakhir
+    - full=true: bangun ulang seluruh store
+    """
+    try:
+        result = await asyncio.to_thread(analytics_store.sync, full)
+        return {"status": "success", **result}
+    except Exception as e:
+        raise HTTPException(500, f"Error: {str(e)}")
+
+
+@router.get("/summary")
+async def sales_summary_endpoint(
+    id_retailer: Optional[int] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    source: str = "auto",
+    fresh: bool = False,
+):
+    """
+    Total orders, revenue, profit, dan AOV dari total_sales/operating_profit
+    - id_retailer: batasi ke satu retailer (wajib diisi pemanggil untuk role
+      selain GM/ADMIN_PUSAT)
+    - source: auto, rollup, store, atau sql (agregasi di Postgres)
+    - fresh=true: sync incremental dulu sebelum membaca salinan lokal
+    """
+    try:
+        if fresh and source != "sql":
+            await asyncio.to_thread(analytics_store.sync)
+        result = await asyncio.to_thread(
+            sales_summary.summary, id_retailer, start, end, source
+        )
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    except Exception as e:
+        raise HTTPException(500, f"Error: {str(e)}")
+    return {"status": "success", **result}
+
+
+@router.get("/rollup")
+async def query_rollup(
+    group_by: str = "",
+    grain: Optional[str] = None,
+    id_retailer: Optional[int] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+):
+    """
+    Total sales, profit, units, dan jumlah transaksi dari rollup cube
+    - group_by: kombinasi retailer,product,method,city (pisahkan dengan koma)
+    - grain: day, week, month, quarter, year
+    """
+    dimensions = [d.strip() for d in group_by.split(",") if d.strip()]
+    try:
+        freshness = await asyncio.to_thread(analytics_store.ensure_fresh)
+        rollup = await asyncio.to_thread(analytics_store.rollup)
+        df = await asyncio.to_thread(
+            rollup.query, dimensions, grain, id_retailer, start, end
+        )
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return PolarsJSONResponse(
+        {"status": "success", "rows": len(df), **freshness, "data": df}
+    )
+
+
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "ipc": ARROW_STREAM,
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+@router.get("/export")
+async def export_transactions(
+    format: str = Query("csv", pattern="^(csv|ndjson|ipc|parquet)$"),
+    id_retailer: Optional[int] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+):
+    """
+    Export transaksi dari analytics store tanpa memuat seluruh tabel
+    - csv/ndjson/ipc: dikirim per batch (export_batch_rows baris)
+    - parquet: ditulis lewat sink_parquet ke file sementara lalu dikirim
+    - Umur store di X-Store-Age-Seconds; 404 kalau store belum ada
+    """
+    if not analytics_store.exists():
+        raise HTTPException(404, "Analytics store belum dibuat, jalankan /sync")
+
+    freshness = await asyncio.to_thread(analytics_store.ensure_fresh)
+    filename = f"transactions.{'arrow' if format == 'ipc' else format}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if freshness["store_age_seconds"] is not None:
+        headers["X-Store-Age-Seconds"] = str(freshness["store_age_seconds"])
+
+    if format == "parquet":
+        fd, path = tempfile.mkstemp(suffix=".parquet")
+        os.close(fd)
+        try:
+            await asyncio.to_thread(
+                PolarsDataProcessor.sink_parquet_file,
+                analytics_store.scan(id_retailer, start, end),
+                path,
+            )
+        except Exception as e:
+            os.remove(path)
+            raise HTTPException(500, f"Error: {str(e)}")
+        return FileResponse(
+            path,
+            media_type=EXPORT_MEDIA_TYPES[format],
+            headers=headers,
+            background=BackgroundTask(os.remove, path),
+        )
+
+    batches = analytics_store.iter_batches(id_retailer, start, end)
+    if format == "csv":
+        body = PolarsDataProcessor.stream_csv(batches)
+    elif format == "ndjson":
+        body = PolarsDataProcessor.stream_ndjson(batches)
+    else:
+        body = PolarsDataProcessor.stream_ipc(batches, STORE_SCHEMA)
+    return StreamingResponse(
+        body, media_type=EXPORT_MEDIA_TYPES[format], headers=headers
+    )
+
+
+# Kolom nama dimensi yang bisa diminta -> tabel dimensinya
+NAME_COLUMNS = {name_col: table for table, (_, name_col, _) in DIMENSIONS.items()}
+DEFAULT_COLUMNS = [
+    "id_transaction",
+    "id_retailer",
+    "retailer_name",
+    "product",
+    "method",
+    "city",
+    "invoice_date",
+    "price_per_unit",
+    "unit_sold",
+    "total_sales",
+    "operating_profit",
+    "operating_margin",
+]
+
+
+def _parse_cursor(cursor: Optional[str]) -> Optional[Tuple[date, int]]:
+    """Cursor '<invoice_date>:<id_transaction>' dari halaman sebelumnya"""
+    if not cursor:
+        return None
+    try:
+        invoice_date, id_transaction = cursor.rsplit(":", 1)
+        return date.fromisoformat(invoice_date), int(id_transaction)
+    except ValueError:
+        raise HTTPException(400, f"Cursor tidak valid: {cursor}")
+
+
+def _parse_columns(columns: Optional[str]) -> List[str]:
+    if not columns:
+        return DEFAULT_COLUMNS
+    selected = [c.strip() for c in columns.split(",") if c.strip()]
+    unknown = [c for c in selected if c not in STORE_SCHEMA and c not in NAME_COLUMNS]
+    if unknown:
+        raise HTTPException(400, f"Kolom tidak dikenal: {', '.join(unknown)}")
+    return selected
+
+
+def _with_names(lf: pl.LazyFrame, columns: List[str]) -> pl.LazyFrame:
+    """Tambah kolom nama dimensi yang diminta (join ke cache dimensi)"""
+    for name_col, table in NAME_COLUMNS.items():
+        if name_col in columns:
+            id_col = DIMENSIONS[table][0]
+            lf = lf.join(
+                dimension_cache.frame(table).lazy(),
+                on=id_col,
+                how="left",
+                maintain_order="left",
+            )
+    return lf
+
+
+def _page_frame(
+    after: Optional[Tuple[date, int]],
+    limit: Optional[int],
+    columns: List[str],
+    id_retailer: Optional[int],
+    start: Optional[date],
+    end: Optional[date],
+    month: Optional[str] = None,
+) -> pl.LazyFrame:
+    return _with_names(
+        analytics_store.page(after, limit, id_retailer, start, end, month), columns
+    ).select(list(dict.fromkeys(columns + PAGE_KEYS)))
+
+
+def _transactions_page(
+    after: Optional[Tuple[date, int]],
+    limit: Optional[int],
+    columns: List[str],
+    id_retailer: Optional[int],
+    start: Optional[date],
+    end: Optional[date],
+) -> Tuple[pl.DataFrame, Optional[str]]:
+    df = _page_frame(after, limit, columns, id_retailer, start, end).collect()
+
+    next_cursor = None
+    if limit is not None and len(df) == limit:
+        last_date, last_id = df.select(PAGE_KEYS).row(-1)
+        next_cursor = f"{last_date.isoformat()}:{last_id}"
+    return df.select(columns), next_cursor
+
+
+def _stream_schema(
+    after: Optional[Tuple[date, int]],
+    columns: List[str],
+    id_retailer: Optional[int],
+    start: Optional[date],
+    end: Optional[date],
+) -> pl.Schema:
+    """Schema stream Arrow (join nama dimensi bisa memuat cache dari Supabase)"""
+    return (
+        _page_frame(after, 0, columns, id_retailer, start, end)
+        .select(columns)
+        .collect_schema()
+    )
+
+
+def _transactions_stream(
+    after: Optional[Tuple[date, int]],
+    columns: List[str],
+    id_retailer: Optional[int],
+    start: Optional[date],
+    end: Optional[date],
+) -> Iterator[pl.DataFrame]:
+    """
+    Semua sisa transaksi tanpa limit, dikumpulkan dan diurutkan per bulan
+    (paling banyak satu bulan partisi di memori)
+    """
+    after_month = after[0].strftime("%Y-%m") if after else None
+    for month in analytics_store.months(id_retailer, start, end):
+        if after_month and month < after_month:
+            continue
+        df = _page_frame(after, None, columns, id_retailer, start, end, month)
+        yield from df.select(columns).collect().iter_slices(settings.export_batch_rows)
+
+
+@router.get("/transactions")
+async def list_transactions(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    columns: Optional[str] = None,
+    id_retailer: Optional[int] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+):
+    """
+    Transaksi urut (invoice_date, id_transaction) dengan keyset pagination
+    - cursor: next_cursor dari halaman sebelumnya
+    - columns: kolom yang dikirim (pisahkan dengan koma), termasuk
+      retailer_name, product, method, city
+    - Accept: application/vnd.apache.arrow.stream -> Arrow IPC stream per
+      batch, tanpa batas baris kalau limit kosong (dibaca per bulan, bukan
+      seluruh tabel sekaligus); cursor di X-Next-Cursor
+    - 404 kalau analytics store belum ada
+    - Selain itu JSON, limit default page_default_rows (maks page_max_rows)
+    - Store di-sync dulu kalau lebih lama dari analytics_store_max_age;
+      umurnya di store_age_seconds / X-Store-Age-Seconds
+    """
+    arrow = ARROW_STREAM in request.headers.get("accept", "")
+    if not arrow:
+        limit = min(limit or settings.page_default_rows, settings.page_max_rows)
+    after = _parse_cursor(cursor)
+    selected = _parse_columns(columns)
+
+    if not analytics_store.exists():
+        # Pemanggil (route Next.js) fallback ke Supabase
+        raise HTTPException(404, "Analytics store belum dibuat, jalankan /sync")
+
+    try:
+        freshness = await asyncio.to_thread(analytics_store.ensure_fresh)
+        if arrow and limit is None:
+            next_cursor = None
+            schema = await asyncio.to_thread(
+                _stream_schema, after, selected, id_retailer, start, end
+            )
+            batches = _transactions_stream(after, selected, id_retailer, start, end)
+        else:
+            df, next_cursor = await asyncio.to_thread(
+                _transactions_page, after, limit, selected, id_retailer, start, end
+            )
+            schema, batches = df.schema, df.iter_slices(settings.export_batch_rows)
+    except Exception as e:
+        raise HTTPException(500, f"Error: {str(e)}")
+
+    if arrow:
+        headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+        if freshness["store_age_seconds"] is not None:
+            headers["X-Store-Age-Seconds"] = str(freshness["store_age_seconds"])
+        return StreamingResponse(
+            PolarsDataProcessor.stream_ipc(batches, schema),
+            media_type=ARROW_STREAM,
+            headers=headers,
+        )
+    return PolarsJSONResponse(
+        {
+            "status": "success",
+            "rows": len(df),
+            "columns": df.columns,
+            "next_cursor": next_cursor,
+            **freshness,
+            "data": df,
+        }
+    )
+
+
+@router.get("/store/stats")
+async def analytics_store_stats():
+    """Jumlah partisi/file, ukuran, dan watermark analytics store"""
+    rollup = await asyncio.to_thread(analytics_store.rollup)
+    return {
+        "status": "success",
+        "store": analytics_store.stats(),
+        "rollup": rollup.stats(),
+    }
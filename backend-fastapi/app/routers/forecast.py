@@ -0,0 +1,61 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from datetime import date
+from typing import Optional
+from app.services.analytics_store import analytics_store
+from app.services.batch_forecast import batch_forecaster
+from app.services.forecasting import ForecastEngine
+
+router = APIRouter(prefix="/api/v1/forecast", tags=["Forecasting"])
+
+
+@router.get("/batch")
+async def batch_forecast(
+    method: str = "holt",
+    value: str = "total_sales",
+    group_by: str = "retailer,product,method",
+    periods: int = Query(7, ge=1, le=366),
+    interval: str = "1d",
+    window: str = "7",
+    season_length: int = Query(7, ge=2),
+    confidence: float = Query(0.95, gt=0, lt=1),
+    id_retailer: Optional[int] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+):
+    """
+    Forecast semua series sekaligus, dikirim sebagai NDJSON per partisi
+    - method: ewma, holt, holt_winters, moving_average, linear_trend
+    - value: total_sales, unit_sold, operating_profit
+    - group_by: kombinasi retailer,product,method,city (key series)
+    - interval: periode resampling dan forecast ("1d", "1w", "1mo")
+    - window: moving_average, jumlah periode ("7") atau rentang ("28d")
+    - Tiap partisi diikuti baris type=partition (waktu proses, jumlah
+      series); baris terakhir type=summary
+    - 400 kalau interval/window tidak valid, 404 kalau analytics store
+      belum ada
+    """
+    if not analytics_store.exists():
+        raise HTTPException(404, "Analytics store belum dibuat, jalankan /sync")
+
+    try:
+        params = {"interval": ForecastEngine.check_duration(interval)}
+        if method == "holt_winters":
+            params["season_length"] = season_length
+        elif method == "moving_average":
+            if window.isdigit():
+                if int(window) < 1:
+                    raise ValueError("window minimal 1")
+                params["window"] = int(window)
+            else:
+                params["window"] = ForecastEngine.check_duration(window)
+        elif method == "linear_trend":
+            params["confidence"] = confidence
+
+        dimensions = [d.strip() for d in group_by.split(",") if d.strip()]
+        body = batch_forecaster.stream(
+            method, dimensions, value, periods, params, id_retailer, start, end
+        )
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return StreamingResponse(body, media_type="application/x-ndjson")
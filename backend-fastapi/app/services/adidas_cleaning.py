@@ -1,6 +1,32 @@
 import io
+import time
+import openpyxl
 import polars as pl
+from datetime import datetime
+from typing import Callable, List, Optional, Tuple
 from fastapi import HTTPException, UploadFile
+from app.config import settings
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def _peak_rss_mb() -> Optional[float]:
+    """Puncak memori proses (RSS) sejauh ini, dalam MB"""
+    if resource is None:
+        return None
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+class CleaningStage:
+    """Satu tahap cleaning; lazy=True berarti fn menerima dan mengembalikan LazyFrame"""
+
+    def __init__(self, name: str, fn: Callable, lazy: bool = False):
+        self.name = name
+        self.fn = fn
+        self.lazy = lazy
 
 
 class AdidasCleaningService:
@@ -17,167 +43,445 @@ class AdidasCleaningService:
 
     SALES_METHODS = ["Online (E-commerce)", "In-store", "Outlet"]
 
-    def __init__(self, db=None):
+    NUMERIC_COLUMNS = [
+        "Price per Unit",
+        "Units Sold",
+        "Total Sales",
+        "Operating Profit",
+        "Operating Margin",
+    ]
+
+    # Baris header sheet + blok metadata sebelum data (lihat _fix_columns_name)
+    HEADER_BLOCK_ROWS = 10
+
+    # Naikkan kalau hasil cleaning berubah, supaya cache upload lama tidak dipakai
+    CLEANING_VERSION = 7
+
+    # Penanda sementara sel null sebelum _fill_missing_values
+    NULL_FLAG_PREFIX = "__null__"
+    # Penanda sementara sel terisi yang jadi null saat _change_data_type
+    TYPE_FLAG_PREFIX = "__type__"
+    # Index baris sementara di _fill_missing_values
+    ROW_INDEX = "__row__"
+
+    def __init__(self, db=None, instrument: bool = False, city_normalizer=None):
         self.db = db
         self.retailer_name = "Unknown"
+        self.imputed_counts = {}
+        self.type_violations = {}
+        self.normalized_cities = {}
+        self.city_normalizer = city_normalizer
+        self.instrument = instrument
+        self.timings = []
 
     async def process_excel(self, file: UploadFile, db=None) -> pl.DataFrame:
         """Main process untuk upload Excel Adidas"""
 
         contents = await file.read()
-        df = pl.read_excel(io.BytesIO(contents))
+        return self.process_bytes(contents)
 
-        # Get city list from database for normalization (skip for now - no db needed)
-        list_city = []
+    def process_bytes(self, contents: bytes) -> pl.DataFrame:
+        """Cleaning dari isi file Excel (dipakai juga oleh background job)"""
+        read_excel = CleaningStage(
+            "read_excel", lambda _: pl.read_excel(io.BytesIO(contents))
+        )
+        df = self._run_stage(read_excel, pl.DataFrame())
+        return self._clean(df)
+
+    def preview_bytes(
+        self, contents: bytes, n_rows: int = 20
+    ) -> Tuple[pl.DataFrame, int]:
+        """
+        Cleaning cepat untuk preview: hanya blok metadata, dua baris header,
+        dan n_rows baris data pertama yang dibaca dari sheet
+        Returns:
+            (DataFrame sampel yang sudah dibersihkan, perkiraan total baris data)
+        """
+        wb = openpyxl.load_workbook(
+            io.BytesIO(contents), read_only=True, data_only=True
+        )
+        try:
+            ws = wb.worksheets[0]
+            raw = []
+            skipped = 0
+            for row in ws.iter_rows(values_only=True):
+                # Seperti pl.read_excel (drop_empty_rows): baris kosong dilewati
+                if all(v is None for v in row):
+                    skipped += 1
+                    continue
+                raw.append(row)
+                if len(raw) >= self.HEADER_BLOCK_ROWS + n_rows:
+                    break
+            max_row = ws.max_row
+            if not max_row or max_row < skipped + len(raw):
+                # Dimensi sheet tidak tercatat: hitung baris dari satu kolom saja
+                max_row = sum(1 for _ in ws.iter_rows(max_col=1, values_only=True))
+        finally:
+            wb.close()
+
+        if not raw:
+            raise HTTPException(400, "File Excel kosong")
+
+        # Kolom yang kosong juga dibuang (drop_empty_cols)
+        used = sorted({i for r in raw for i, v in enumerate(r) if v is not None})
+        raw = [tuple(r[i] if i < len(r) else None for i in used) for r in raw]
+
+        names = []
+        for i, header in enumerate(raw[0]):
+            name = str(header) if header is not None else f"__UNNAMED__{i}"
+            names.append(name if name not in names else f"{name}_{i}")
+
+        df = pl.DataFrame(
+            {
+                name: [self._cell_to_str(r[i]) for r in raw[1:]]
+                for i, name in enumerate(names)
+            },
+            schema={name: pl.String for name in names},
+        )
+        total_rows = max(0, max_row - skipped - self.HEADER_BLOCK_ROWS)
+        return self._clean(df), total_rows
+
+    @staticmethod
+    def _cell_to_str(value) -> Optional[str]:
+        """Samakan format sel openpyxl dengan hasil pl.read_excel (kolom string)"""
+        if value is None:
+            return None
+        if isinstance(value, datetime):
+            return value.strftime("%Y-%m-%d %H:%M:%S")
+        if isinstance(value, float) and value.is_integer():
+            return str(int(value))
+        return str(value)
+
+    def _stages(self) -> List[CleaningStage]:
+        """Urutan tahap cleaning"""
+        return [
+            # Eager: butuh nilai sel sheet mentah (posisi metadata dan header)
+            CleaningStage("search_info_department", self._search_info_department),
+            CleaningStage("fix_columns_name", self._fix_columns_name),
+            # Lazy: digabung jadi satu query plan
+            CleaningStage("retailer_name", self._retailer_name, lazy=True),
+            CleaningStage("change_data_type", self._change_data_type, lazy=True),
+            CleaningStage("fix_merged_cell", self._fix_merged_cell, lazy=True),
+            CleaningStage("fill_missing_values", self._fill_missing_values, lazy=True),
+            CleaningStage("normalize_city", self._normalize_city, lazy=True),
+            CleaningStage("fill_product", self._fill_product, lazy=True),
+        ]
+
+    def _clean(self, df: pl.DataFrame) -> pl.DataFrame:
+        """
+        Jalankan semua tahap cleaning pada sheet mentah
+        - Tahap lazy disusun di atas satu LazyFrame dan di-collect sekali
+        - instrument=True: tiap tahap di-collect sendiri supaya waktu, jumlah
+          baris, dan memori per tahap terukur (tanpa fusi antar tahap)
+        - Tahap yang gagal dilaporkan sebagai 422 dengan nama tahapnya
+        """
+        stages = self._stages()
+        lazy_stages = [stage for stage in stages if stage.lazy]
+
+        for stage in stages:
+            if not stage.lazy:
+                df = self._run_stage(stage, df)
+
+        if self.instrument:
+            for stage in lazy_stages:
+                df = self._run_stage(stage, df)
+        else:
+            lf = df.lazy()
+            try:
+                for stage in lazy_stages:
+                    lf = stage.fn(lf)
+                result = lf.collect()
+            except HTTPException:
+                raise
+            except Exception as e:
+                # Ulangi per tahap untuk tahu tahap mana yang gagal
+                for stage in lazy_stages:
+                    df = self._run_stage(stage, df)
+                # Per tahap lolos: gagalnya hanya di plan gabungan
+                names = ", ".join(stage.name for stage in lazy_stages)
+                raise HTTPException(
+                    422, f"Cleaning gagal di tahap gabungan ({names}): {e}"
+                )
+            df = result
 
-        # Execute all cleaning steps
-        df = self._search_info_department(df)
-        df = self._fix_columns_name(df)
-        df = self._retailer_name(df)
-        df = self._change_data_type(df)
-        df = self._fix_merged_cell(df)
-        df = self._fill_missing_values(df)
-        df = self._normalize_city(df, list_city)
-        df = self._fill_product(df)
+        return self._pop_flags(df)
 
-        return df
+    def _run_stage(self, stage: CleaningStage, df: pl.DataFrame) -> pl.DataFrame:
+        """Jalankan (dan collect) satu tahap; catat metriknya kalau instrument"""
+        started = time.perf_counter()
+        try:
+            if stage.lazy:
+                out = stage.fn(df.lazy()).collect()
+            else:
+                out = stage.fn(df)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(422, f"Cleaning gagal di tahap {stage.name}: {e}")
+
+        if self.instrument:
+            self.timings.append(
+                {
+                    "stage": stage.name,
+                    "seconds": round(time.perf_counter() - started, 6),
+                    "rows_in": len(df),
+                    "rows_out": len(out),
+                    "frame_mb": round(out.estimated_size("mb"), 3),
+                    "peak_rss_mb": _peak_rss_mb(),
+                }
+            )
+        return out
 
     def _search_info_department(self, df: pl.DataFrame) -> pl.DataFrame:
-        """Cari department/retailer info"""
-        posisi_lengkap = (
-            df.with_row_index("row_nr")
-            .unpivot(index="row_nr")
-            .filter(pl.col("value") == "Retailer")
+        """
+        Cari department/retailer info
+        - Label "Retailer" dicari di area header saja (metadata_scan_rows x
+          metadata_scan_cols), urut per baris, berhenti di kecocokan pertama
+        - Seluruh sheet hanya discan kalau metadata_full_scan diaktifkan
+        """
+        koordinat_angka = self._find_label(
+            df.head(settings.metadata_scan_rows).select(
+                df.columns[: settings.metadata_scan_cols]
+            ),
+            "Retailer",
         )
+        if koordinat_angka is None and settings.metadata_full_scan:
+            koordinat_angka = self._find_label(df, "Retailer")
 
-        if posisi_lengkap.is_empty():
+        if koordinat_angka is None:
             raise HTTPException(404, "gada identitas departemen")
 
-        all_columns = df.columns
-        koordinat_angka = []
-
-        for row, col_name in zip(posisi_lengkap["row_nr"], posisi_lengkap["variable"]):
-            col_idx = all_columns.index(col_name)
-            koordinat_angka = [row, col_idx]
-
-        if koordinat_angka:
-            retailer = df[koordinat_angka[0], koordinat_angka[1] + 1]
-            self.retailer_name = str(retailer) if retailer else "Unknown"
-        else:
-            self.retailer_name = "Unknown"
+        row, col_idx = koordinat_angka
+        retailer = df[row, col_idx + 1] if col_idx + 1 < df.width else None
+        self.retailer_name = str(retailer) if retailer else "Unknown"
 
         return df
 
+    @staticmethod
+    def _find_label(df: pl.DataFrame, label: str) -> Optional[Tuple[int, int]]:
+        """Posisi (baris, kolom) pertama berisi label, urut baris lalu kolom"""
+        found = None
+        for col_idx, name in enumerate(df.columns):
+            if df.schema[name] != pl.String:
+                continue
+            # Baris yang dicek cukup sampai kecocokan terbaik sejauh ini
+            column = df.get_column(name)
+            if found is not None:
+                column = column.head(found[0] + 1)
+            rows = (column == label).arg_true()
+            if not rows.is_empty() and (found is None or rows[0] < found[0]):
+                found = (rows[0], col_idx)
+        return found
+
     def _fix_columns_name(self, df: pl.DataFrame) -> pl.DataFrame:
         """Fix column names"""
         if len(df) < 9:
             return df
 
-        try:
-            top_col = list(df.row(7))
-            bottom_col = tuple(df.row(8))
+        top_col = list(df.row(7))
+        bottom_col = tuple(df.row(8))
 
-            top_col[2] = bottom_col[2]
-            top_col[3] = bottom_col[3]
-            top_col = tuple(top_col)
+        top_col[2] = bottom_col[2]
+        top_col[3] = bottom_col[3]
 
-            df = df.rename({old: new for old, new in zip(df.columns, top_col)})
-            df = df[9:]
-            return pl.DataFrame(df)
-        except:
-            return df
+        if None in top_col or len(set(top_col)) != len(top_col):
+            raise HTTPException(422, f"Header tabel tidak valid: {top_col}")
 
-    def _retailer_name(self, df: pl.DataFrame) -> pl.DataFrame:
-        """Add retailer column"""
-        df = df.with_columns(Retailer=pl.lit(self.retailer_name))
-        return df
+        df = df.rename({old: new for old, new in zip(df.columns, top_col)})
+        return df[9:]
 
-    def _change_data_type(self, df: pl.DataFrame) -> pl.DataFrame:
-        """Change data types"""
-        try:
-            df = df.with_columns(
-                pl.col("Price per Unit").cast(pl.Float64),
-                pl.col("Units Sold").cast(pl.Int16),
-                pl.col("Total Sales").cast(pl.Float64),
-                pl.col("Operating Profit").cast(pl.Float64),
-                pl.col("Operating Margin").cast(pl.Float32),
+    def _retailer_name(self, lf: pl.LazyFrame) -> pl.LazyFrame:
+        """Add retailer column"""
+        return lf.with_columns(Retailer=pl.lit(self.retailer_name))
+
+    def _change_data_type(self, lf: pl.LazyFrame) -> pl.LazyFrame:
+        """Change data types (sel yang bukan angka/tanggal jadi null)"""
+
+        def number(name):
+            return pl.col(name).cast(pl.Float64, strict=False)
+
+        casts = {
+            "Price per Unit": number("Price per Unit"),
+            # Int32 = INTEGER di tabel transaction
+            "Units Sold": number("Units Sold").round(0).cast(pl.Int32, strict=False),
+            "Total Sales": number("Total Sales"),
+            "Operating Profit": number("Operating Profit"),
+            "Operating Margin": number("Operating Margin").cast(pl.Float32),
+        }
+        # Parse date (pl.read_excel bisa juga sudah memberi tipe tanggal)
+        if lf.collect_schema().get("Invoice Date") == pl.String:
+            casts["Invoice Date"] = (
+                pl.col("Invoice Date")
+                .str.to_datetime("%Y-%m-%d %H:%M:%S", strict=False)
+                .cast(pl.Date)
             )
 
-            # Try to parse date
-            if "Invoice Date" in df.columns:
-                df = df.with_columns(
-                    pl.col("Invoice Date")
-                    .str.to_datetime("%Y-%m-%d %H:%M:%S")
-                    .cast(pl.Date)
+        # Sel yang terisi tapi gagal di-cast ditandai (lihat _pop_flags);
+        # satu with_columns, jadi penanda masih melihat nilai aslinya
+        return lf.with_columns(
+            [
+                (pl.col(c).is_not_null() & expr.is_null()).alias(
+                    self.TYPE_FLAG_PREFIX + c
                 )
-        except:
-            pass
-        return df
+                for c, expr in casts.items()
+            ]
+            + [expr.alias(c) for c, expr in casts.items()]
+        )
 
-    def _fix_merged_cell(self, df: pl.DataFrame) -> pl.DataFrame:
+    def _fix_merged_cell(self, lf: pl.LazyFrame) -> pl.LazyFrame:
         """Fill forward merged cells"""
-        try:
-            df = df.with_columns(
-                pl.col("State").forward_fill(),
-                pl.col("City").forward_fill(),
-                pl.col("Sales Method").forward_fill(),
-            )
-        except:
-            pass
-        return df
+        return lf.with_columns(
+            pl.col("State").forward_fill(),
+            pl.col("City").forward_fill(),
+            pl.col("Sales Method").forward_fill(),
+        )
 
-    def _fill_missing_values(self, df: pl.DataFrame) -> pl.DataFrame:
-        """Fill missing values with calculations"""
-        try:
-            for i in range(5):
-                df = df.with_columns(
-                    pl.col("Price per Unit").fill_null(
-                        pl.col("Total Sales") / pl.col("Units Sold")
-                    ),
-                    pl.col("Units Sold").fill_null(
-                        pl.col("Total Sales") / pl.col("Price per Unit")
-                    ),
-                    pl.col("Total Sales").fill_null(
-                        pl.col("Units Sold") * pl.col("Price per Unit")
-                    ),
-                    pl.col("Operating Profit").fill_null(
-                        pl.col("Total Sales") * pl.col("Operating Margin")
-                    ),
-                    pl.col("Operating Margin").fill_null(
-                        pl.col("Operating Profit") / pl.col("Total Sales")
-                    ),
-                )
-        except:
-            pass
-        return df
+    def _fill_missing_values(self, lf: pl.LazyFrame) -> pl.LazyFrame:
+        """
+        Fill missing values with calculations (satu pass, lihat _derivation_exprs)
+        - Hanya baris yang punya null yang dihitung ulang: plan dipecah jadi
+          baris lengkap dan baris ber-null, lalu disambung lagi dengan
+          merge_sorted pada index baris (tetap lazy, tanpa collect di tengah
+          pipeline dan tanpa sort ulang)
+        - Sel yang sudah terisi tidak berubah (coalesce)
+        - Posisi null ditandai dulu supaya jumlah sel yang terisi bisa dihitung
+          di _pop_flags tanpa collect tambahan
+        """
+        schema = lf.collect_schema()
+        if any(
+            c not in schema or not schema[c].is_numeric() for c in self.NUMERIC_COLUMNS
+        ):
+            return lf
+
+        flags = [self.NULL_FLAG_PREFIX + c for c in self.NUMERIC_COLUMNS]
+        lf = lf.with_columns(
+            pl.col(c).is_null().alias(flag)
+            for c, flag in zip(self.NUMERIC_COLUMNS, flags)
+        ).with_row_index(self.ROW_INDEX)
+        # Kedua cabang membaca hasil tahap sebelumnya yang sama (dihitung sekali)
+        lf = lf.cache()
+        has_null = pl.any_horizontal(flags)
+
+        complete = lf.filter(~has_null)
+        solved = lf.filter(has_null).with_columns(self._derivation_exprs(schema))
+        return complete.merge_sorted(solved, key=self.ROW_INDEX).drop(self.ROW_INDEX)
+
+    def _pop_flags(self, df: pl.DataFrame) -> pl.DataFrame:
+        """
+        Isi self.imputed_counts (penanda null) dan self.type_violations
+        ({kolom: index baris yang gagal di-cast}) lalu buang penandanya
+        """
+        null_flags = [self.NULL_FLAG_PREFIX + c for c in self.NUMERIC_COLUMNS]
+        has_null_flags = all(flag in df.columns for flag in null_flags)
+        type_flags = [c for c in df.columns if c.startswith(self.TYPE_FLAG_PREFIX)]
+
+        exprs = [pl.col(flag).arg_true().implode() for flag in type_flags]
+        if has_null_flags:
+            exprs += [
+                (pl.col(flag) & pl.col(c).is_not_null()).sum().alias(c)
+                for flag, c in zip(null_flags, self.NUMERIC_COLUMNS)
+            ]
+        if not exprs:
+            return df
 
-    def _normalize_city(self, df: pl.DataFrame, list_normalize: list) -> pl.DataFrame:
-        """Normalize city names - skip if no list provided"""
-        return df
+        row = df.select(exprs).row(0, named=True)
+        if has_null_flags:
+            self.imputed_counts = {c: int(row[c]) for c in self.NUMERIC_COLUMNS}
+        self.type_violations = {
+            flag[len(self.TYPE_FLAG_PREFIX) :]: row[flag]
+            for flag in type_flags
+            if row[flag]
+        }
+        return df.drop(type_flags + (null_flags if has_null_flags else []))
+
+    def _derivation_exprs(self, schema) -> list:
+        """
+        Turunkan price/units/sales/profit/margin dari nilai yang ada
+        (Total Sales = Price x Units, Operating Profit = Total Sales x Margin).
+        Total Sales jadi pusat: begitu sales diketahui, semua kolom lain yang
+        masih bisa dihitung langsung terisi, jadi tidak perlu iterasi.
+        """
+
+        def col(name):
+            return pl.col(name).cast(pl.Float64)
+
+        def div(num, den):
+            return pl.when(den != 0).then(num / den)
+
+        sales = pl.coalesce(
+            col("Total Sales"),
+            col("Price per Unit") * col("Units Sold"),
+            div(col("Operating Profit"), col("Operating Margin")),
+        )
+        derived = {
+            "Total Sales": sales,
+            "Price per Unit": pl.coalesce(
+                col("Price per Unit"), div(sales, col("Units Sold"))
+            ),
+            "Units Sold": pl.coalesce(
+                col("Units Sold"), div(sales, col("Price per Unit"))
+            ),
+            "Operating Profit": pl.coalesce(
+                col("Operating Profit"), sales * col("Operating Margin")
+            ),
+            "Operating Margin": pl.coalesce(
+                col("Operating Margin"), div(col("Operating Profit"), sales)
+            ),
+        }
+
+        exprs = []
+        for name, expr in derived.items():
+            dtype = schema[name]
+            if dtype.is_integer():
+                expr = expr.round(0)
+            # Nilai turunan di luar jangkauan tipe kolom jadi null, bukan error
+            exprs.append(expr.cast(dtype, strict=False).alias(name))
+        return exprs
+
+    def _normalize_city(self, lf: pl.LazyFrame) -> pl.LazyFrame:
+        """Normalize city names ke tabel dimensi city (skip kalau tanpa normalizer)"""
+        if self.city_normalizer is None:
+            return lf
+
+        def normalize(cities: pl.Series) -> pl.Series:
+            # Hanya kota unik yang dicocokkan, hasilnya di-join ke semua baris
+            mapping = self.city_normalizer.mapping(cities.drop_nulls().unique())
+            self.normalized_cities = mapping
+            return self.city_normalizer.normalize(cities, mapping)
+
+        return lf.with_columns(
+            pl.col("City")
+            .cast(pl.String)
+            .map_batches(normalize, return_dtype=pl.String)
+        )
 
-    def _fill_product(self, df: pl.DataFrame) -> pl.DataFrame:
+    def _fill_product(self, lf: pl.LazyFrame) -> pl.LazyFrame:
         """Fill product using cycling pattern"""
-        try:
-            df = df.with_columns(((pl.int_range(0, pl.len()) % 6) + 1).alias("ulang_6"))
-
-            df = df.with_columns(
-                [pl.col("ulang_6").cast(pl.Int64), pl.col("Product").cast(pl.String)]
-            )
-
-            buah_map = {i + 1: p for i, p in enumerate(self.PRODUCT_CYCLE)}
+        ulang_6 = (pl.int_range(0, pl.len(), dtype=pl.Int64) % 6) + 1
+        buah_map = {i + 1: p for i, p in enumerate(self.PRODUCT_CYCLE)}
 
-            df = df.with_columns(
-                pl.col("Product").fill_null(
-                    pl.col("ulang_6").replace(
-                        buah_map, default=None, return_dtype=pl.String
-                    )
-                )
-            )
+        return lf.with_columns(
+            pl.col("Product")
+            .cast(pl.String)
+            .fill_null(ulang_6.replace_strict(buah_map, return_dtype=pl.String))
+        )
 
-            df = df.drop("ulang_6")
-        except:
-            pass
-        return df
+    def report(self) -> dict:
+        """Ringkasan proses cleaning terakhir"""
+        report = {
+            "retailer": self.retailer_name,
+            "imputed": self.imputed_counts,
+            # Sel bukan angka/tanggal yang jadi null saat cleaning
+            "type_violations": {
+                c: len(rows) for c, rows in self.type_violations.items()
+            },
+            # Dipakai UploadValidator (aturan <kolom>_wrong_type)
+            "type_violation_rows": self.type_violations,
+            "normalized_cities": self.normalized_cities,
+        }
+        if self.instrument:
+            report["timings"] = self.timings
+        return report
 
     def to_dict(self, df: pl.DataFrame) -> list:
         """Convert DataFrame to list of dicts"""
@@ -0,0 +1,286 @@
+import asyncio
+import polars as pl
+from fastapi import HTTPException
+from typing import Any, Callable, Dict, List, Optional
+from app.config import settings
+from app.services.analytics_store import analytics_store
+from app.services.bulk_loader import CopyBulkLoader
+from app.services.dimension_cache import dimension_cache
+from app.services.insert_pipeline import InsertPipeline
+from app.services.row_hash_index import row_hash_index, with_row_hashes
+from app.services.city_normalizer import CityNormalizer
+from app.services.transaction_mapper import (
+    AUTO_CREATE_DIMENSIONS,
+    DIMENSIONS,
+    OPT_IN_DIMENSIONS,
+    TRANSACTION_COLUMNS,
+    TransactionMapper,
+)
+from app.services.upload_cache import upload_cache
+from app.services.upload_validator import UploadValidator
+from app.supabase_client import supabase
+
+
+class UploadProgress:
+    """Penerima progress upload (default: tidak melakukan apa-apa)"""
+
+    def set_stage(self, stage: str) -> None:
+        pass
+
+    def set_total(self, rows: int) -> None:
+        pass
+
+    def set_processed(self, rows: int) -> None:
+        pass
+
+
+class AdidasUploadService:
+    """Alur upload lengkap: cleaning -> mapping dimensi -> simpan transaksi"""
+
+    def __init__(self, progress: Optional[UploadProgress] = None):
+        self.progress = progress or UploadProgress()
+
+    async def run(
+        self,
+        contents: bytes,
+        filename: str = "",
+        force: bool = False,
+        timings: bool = False,
+        mode: str = "append",
+    ) -> Dict[str, Any]:
+        """
+        Proses isi file Excel sampai tersimpan; Polars jalan di thread
+        Args:
+            contents: Isi file Excel
+            filename: Nama file (dicatat untuk deteksi upload ganda)
+            force: Tetap upload walaupun file yang sama sudah pernah diupload
+            timings: Sertakan waktu per tahap cleaning (null kalau dari cache)
+            mode: "append" hanya menulis baris baru; "replace" juga mengganti
+                baris yang natural key-nya sama tapi nilainya berubah
+        """
+        digest = await asyncio.to_thread(upload_cache.digest, contents)
+        previous = None if force else upload_cache.claim_upload(digest)
+        if previous is not None:
+            raise HTTPException(
+                409,
+                "File yang sama sudah pernah/sedang diupload "
+                f"({previous.get('saved', 0)} baris). "
+                "Pakai force=true untuk upload ulang",
+            )
+
+        saved_info = None
+        try:
+            result = await self._process(contents, digest, timings, mode)
+            if result["saved"]:
+                saved_info = {"filename": filename, "saved": result["saved"]}
+            return result
+        finally:
+            upload_cache.release_upload(digest, saved_info, claimed=not force)
+
+    async def _process(
+        self,
+        contents: bytes,
+        digest: str,
+        timings: bool = False,
+        mode: str = "append",
+    ) -> Dict[str, Any]:
+        self.progress.set_stage("cleaning")
+        # Hasil cleaning dari /preview dipakai ulang kalau isi file sama
+        _, cleaned_df = await upload_cache.load(contents, digest, instrument=timings)
+
+        self.progress.set_stage("mapping")
+        dimensions = await asyncio.to_thread(dimension_cache.frames)
+        created, dimension_errors, clustered = {}, {}, {}
+        if settings.create_unknown_dimensions:
+            unknown = await asyncio.to_thread(
+                TransactionMapper.unknown_members,
+                cleaned_df,
+                dimensions,
+                self._auto_create_tables(),
+            )
+            if "city" in unknown:
+                cleaned_df, unknown["city"], clustered = await asyncio.to_thread(
+                    self._cluster_cities, cleaned_df, unknown["city"]
+                )
+            for table, names in unknown.items():
+                try:
+                    await asyncio.to_thread(
+                        dimension_cache.create_members, table, names
+                    )
+                    created[table] = len(names)
+                except Exception as e:
+                    # Gagal buat anggota baru: baris tetap masuk dengan ID default
+                    dimension_errors[table] = str(e)
+            if created:
+                dimensions = await asyncio.to_thread(dimension_cache.frames)
+        cleaning_report = dict(upload_cache.get_report(digest) or {})
+        cleaning_timings = cleaning_report.pop("timings", None)
+        validation = await asyncio.to_thread(
+            UploadValidator(dimensions).validate,
+            cleaned_df,
+            cleaning_report.pop("type_violation_rows", None),
+        )
+        transactions = await asyncio.to_thread(
+            TransactionMapper.map_transactions, cleaned_df, dimensions
+        )
+
+        # Bandingkan dengan transaksi yang sudah tersimpan (natural key hash)
+        self.progress.set_stage("deduplicating")
+        hashed = await asyncio.to_thread(with_row_hashes, transactions)
+        plan = await asyncio.to_thread(row_hash_index.plan, hashed)
+        to_write = plan["new"]
+        replaced = None
+        if mode == "replace" and len(plan["changed"]):
+            replaced = plan["changed"]
+            to_write = pl.concat([to_write, replaced])
+        self.progress.set_total(len(to_write))
+
+        self.progress.set_stage("inserting")
+        stored_rows: List[Dict[str, Any]] = []
+        deleted_rows: List[Dict[str, Any]] = []
+        insert_result = await self._save(
+            to_write.select(TRANSACTION_COLUMNS),
+            on_rows=stored_rows.extend,
+            replaced=replaced,
+            on_deleted=deleted_rows.extend,
+        )
+        saved_count = insert_result["saved"]
+        self.progress.set_processed(saved_count)
+        await asyncio.to_thread(self._update_index, to_write, insert_result)
+        store_result = await asyncio.to_thread(
+            self._update_store, stored_rows, deleted_rows
+        )
+
+        result = {
+            "status": "success",
+            "message": f"Berhasil upload {saved_count} data",
+            "total_processed": len(transactions),
+            "saved": saved_count,
+            "insert": insert_result,
+            "dedup": {
+                "mode": mode,
+                "new": len(plan["new"]),
+                "changed": len(plan["changed"]),
+                "unchanged": len(plan["unchanged"]),
+                "deleted": len(deleted_rows),
+            },
+            "analytics_store": store_result,
+            "created_dimensions": created,
+            "clustered_cities": clustered,
+            "validation": validation,
+            "cleaning": cleaning_report,
+        }
+        if dimension_errors:
+            result["dimension_errors"] = dimension_errors
+        if timings:
+            result["timings"] = cleaning_timings
+        return result
+
+    @staticmethod
+    def _auto_create_tables() -> tuple:
+        return tuple(
+            table
+            for table in AUTO_CREATE_DIMENSIONS
+            if table not in OPT_IN_DIMENSIONS or settings.create_unknown_cities
+        )
+
+    @staticmethod
+    def _cluster_cities(df: pl.DataFrame, names: List[str]) -> tuple:
+        """
+        Gabungkan ejaan kota baru yang mirip satu sama lain sebelum dibuat
+        Perwakilan = ejaan yang paling sering muncul di file
+        Returns:
+            (frame dengan nama kota yang sudah digabung, kota yang dibuat,
+             {ejaan: perwakilan})
+        """
+        source = DIMENSIONS["city"][2]
+        counts = (
+            df.select(pl.col(source).cast(pl.String))
+            .filter(pl.col(source).is_in(names))
+            .group_by(source)
+            .len()
+            .sort(["len", source], descending=[True, False])
+        )
+        ordered = counts.get_column(source).to_list()
+        mapping = CityNormalizer.cluster(ordered, settings.city_match_threshold)
+        if not mapping:
+            return df, names, {}
+        normalizer = CityNormalizer([], settings.city_match_threshold)
+        df = df.with_columns(
+            normalizer.normalize(df.get_column(source), mapping).alias(source)
+        )
+        return df, [n for n in ordered if n not in mapping], mapping
+
+    @staticmethod
+    def _update_index(written: pl.DataFrame, insert_result: Dict[str, Any]) -> None:
+        """Catat baris tersimpan; kalau ada yang gagal, index dibangun ulang nanti"""
+        for (id_retailer,), rows in written.group_by("id_retailer"):
+            if insert_result["failed"]:
+                row_hash_index.invalidate(id_retailer)
+            else:
+                row_hash_index.add(id_retailer, rows)
+
+    @staticmethod
+    def _update_store(
+        stored_rows: List[Dict[str, Any]], deleted_rows: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Cerminkan perubahan upload ke analytics store lokal"""
+        try:
+            removed = analytics_store.delete(r["id_transaction"] for r in deleted_rows)
+            added = analytics_store.append(
+                pl.DataFrame(stored_rows, infer_schema_length=None)
+            )
+        except Exception as e:
+            # Store hanya salinan: sync() berikutnya akan menyusul
+            return {"error": str(e)}
+        return {"added": added, "removed": removed}
+
+    async def _save(
+        self,
+        transactions: pl.DataFrame,
+        on_rows: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+        replaced: Optional[pl.DataFrame] = None,
+        on_deleted: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+    ) -> Dict[str, Any]:
+        """
+        COPY via DATABASE_URL kalau diaktifkan, REST sebagai fallback
+        replaced: baris mode replace; versi lama dengan natural key yang sama
+        dihapus hanya kalau insert berhasil
+        - COPY: DELETE ... USING staging + INSERT dalam satu transaksi
+        - REST: id lama dibaca sebelum insert, dihapus per batch setelahnya
+        """
+        if transactions.is_empty():
+            return {"backend": None, "saved": 0, "failed": 0}
+        replace = replaced is not None and not replaced.is_empty()
+        fallback_reason = None
+        if CopyBulkLoader.is_enabled():
+            try:
+                return await asyncio.to_thread(
+                    CopyBulkLoader().load,
+                    transactions,
+                    on_rows,
+                    replace,
+                    on_deleted,
+                )
+            except Exception as e:
+                fallback_reason = str(e)
+
+        old_ids = []
+        if replace:
+            old_ids = await asyncio.to_thread(row_hash_index.stored_ids, replaced)
+        insert_result = await InsertPipeline(supabase).run(
+            transactions, on_progress=self.progress.set_processed, on_rows=on_rows
+        )
+        insert_result["backend"] = "rest"
+        if fallback_reason:
+            insert_result["fallback_reason"] = fallback_reason
+        if old_ids:
+            if insert_result["failed"]:
+                # Versi lama dibiarkan: lebih baik dobel daripada hilang
+                insert_result["replace_skipped"] = len(old_ids)
+            else:
+                deleted = await asyncio.to_thread(row_hash_index.delete_ids, old_ids)
+                if on_deleted:
+                    on_deleted(deleted)
+                insert_result["deleted"] = len(deleted)
+        return insert_result
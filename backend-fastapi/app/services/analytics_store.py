@@ -0,0 +1,473 @@
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+import polars as pl
+import pyarrow.parquet as pq
+from datetime import date
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from app.config import settings
+from app.services.rollup_store import RollupStore, rollup_store
+from app.supabase_client import supabase
+
+# Kolom tabel transaction yang disimpan (id_retailer jadi kolom partisi)
+STORE_SCHEMA = {
+    "id_transaction": pl.Int64,
+    "id_retailer": pl.Int64,
+    "id_city": pl.Int64,
+    "id_product": pl.Int64,
+    "id_method": pl.Int64,
+    "id_upload": pl.Int64,
+    "invoice_date": pl.Date,
+    "price_per_unit": pl.Float64,
+    "unit_sold": pl.Int64,
+    "total_sales": pl.Float64,
+    "operating_profit": pl.Float64,
+    "operating_margin": pl.Float64,
+    "created_at": pl.String,
+    "is_approved": pl.Boolean,
+}
+PARTITION_COLUMNS = ["id_retailer", "month"]
+PAGE_KEYS = ["invoice_date", "id_transaction"]
+HIVE_SCHEMA = {"id_retailer": pl.Int64, "month": pl.String}
+
+_FETCH_PAGE_ROWS = 1000
+
+
+class AnalyticsStore:
+    """
+    Salinan lokal tabel transaction dalam Parquet, partisi retailer/bulan
+    - Layout: {directory}/id_retailer=<id>/month=<YYYY-MM>/part-*.parquet
+    - Upload menambah baris yang dikembalikan database (append)
+    - sync() menarik baris dengan created_at setelah watermark (termasuk
+      insert langsung dari route Next.js); update/delete di luar upload baru
+      terlihat setelah sync(full=True)
+    - ensure_fresh() dipanggil sebelum membaca: sync incremental kalau
+      sudah lebih lama dari analytics_store_max_age
+    - scan() mengembalikan LazyFrame; filter retailer/tanggal memangkas partisi
+    - Setiap baris yang masuk/keluar ikut diteruskan ke rollup cube
+    """
+
+    def __init__(
+        self,
+        client,
+        directory: str,
+        rollups: Optional[RollupStore] = None,
+        max_parts: int = 8,
+    ):
+        self.client = client
+        self.directory = directory
+        self.rollups = rollups
+        self.max_parts = max_parts
+        self._lock = threading.RLock()
+
+    # ==================== STATE ====================
+    def _state_path(self) -> str:
+        return os.path.join(self.directory, "_state.json")
+
+    def _read_state(self) -> Dict[str, Any]:
+        try:
+            with open(self._state_path()) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"watermark": None, "last_sync": None}
+
+    def _write_state(self, state: Dict[str, Any]) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._state_path(), "w") as f:
+            json.dump(state, f)
+
+    # ==================== WRITE ====================
+    @staticmethod
+    def _normalize(rows: pl.DataFrame) -> pl.DataFrame:
+        """Samakan tipe kolom baris dari REST/COPY dengan STORE_SCHEMA"""
+        exprs = []
+        for name, dtype in STORE_SCHEMA.items():
+            if name not in rows.columns:
+                exprs.append(pl.lit(None, dtype).alias(name))
+            elif dtype == pl.Date:
+                exprs.append(
+                    pl.col(name).cast(pl.String).str.slice(0, 10).str.to_date()
+                )
+            else:
+                exprs.append(pl.col(name).cast(dtype))
+        return rows.select(exprs).with_columns(
+            pl.col("invoice_date").dt.strftime("%Y-%m").alias("month")
+        )
+
+    def _partition_dir(self, id_retailer: int, month: str) -> str:
+        return os.path.join(
+            self.directory, f"id_retailer={id_retailer}", f"month={month}"
+        )
+
+    def _write_partition(self, path: str, rows: pl.DataFrame) -> None:
+        """Tambah satu file part; gabung jadi satu file kalau sudah terlalu banyak"""
+        os.makedirs(path, exist_ok=True)
+        parts = [n for n in os.listdir(path) if n.endswith(".parquet")]
+        if len(parts) >= self.max_parts:
+            existing = pl.read_parquet(os.path.join(path, "*.parquet"))
+            rows = pl.concat([existing, rows], how="vertical_relaxed")
+
+        tmp_path = os.path.join(path, f".{uuid.uuid4().hex}.tmp")
+        # Row group kecil: export per batch tidak perlu decode group besar
+        rows.write_parquet(tmp_path, row_group_size=settings.export_batch_rows)
+        os.replace(tmp_path, os.path.join(path, f"part-{uuid.uuid4().hex}.parquet"))
+        if len(parts) >= self.max_parts:
+            for name in parts:
+                os.remove(os.path.join(path, name))
+
+    def append(self, rows: pl.DataFrame) -> int:
+        """
+        Tambah baris transaksi (harus punya id_transaction)
+        Returns:
+            Jumlah baris yang benar-benar baru (id yang sudah ada dilewati)
+        """
+        if rows.is_empty():
+            return 0
+        rows = self._normalize(rows).unique("id_transaction", keep="last")
+        added = []
+        with self._lock:
+            for (id_retailer, month), part in rows.group_by(
+                PARTITION_COLUMNS, maintain_order=True
+            ):
+                path = self._partition_dir(id_retailer, month)
+                if os.path.isdir(path) and os.listdir(path):
+                    stored = pl.scan_parquet(os.path.join(path, "*.parquet")).select(
+                        "id_transaction"
+                    )
+                    part = (
+                        part.lazy()
+                        .join(stored, on="id_transaction", how="anti")
+                        .collect()
+                    )
+                if part.is_empty():
+                    continue
+                self._write_partition(path, part.drop(PARTITION_COLUMNS))
+                added.append(part)
+
+            if added and self.rollups is not None:
+                self.rollups.apply(pl.concat(added))
+        return sum(len(part) for part in added)
+
+    def delete(self, ids: Iterable[int]) -> int:
+        """Buang transaksi berdasarkan id (misalnya setelah upload mode replace)"""
+        ids = pl.Series("id_transaction", list(ids), dtype=pl.Int64)
+        if ids.is_empty() or not self.exists():
+            return 0
+        removed = []
+        with self._lock:
+            hits = (
+                self._scan_partitions()
+                .filter(pl.col("id_transaction").is_in(ids.implode()))
+                .select(PARTITION_COLUMNS)
+                .unique()
+                .collect()
+            )
+            for id_retailer, month in hits.iter_rows():
+                path = self._partition_dir(id_retailer, month)
+                existing = pl.read_parquet(os.path.join(path, "*.parquet"))
+                hit = pl.col("id_transaction").is_in(ids.implode())
+                removed.append(
+                    existing.filter(hit).with_columns(id_retailer=pl.lit(id_retailer))
+                )
+                kept = existing.filter(~hit)
+                shutil.rmtree(path)
+                if not kept.is_empty():
+                    self._write_partition(path, kept)
+
+            if removed and self.rollups is not None:
+                self.rollups.apply(None, removed=pl.concat(removed))
+        return sum(len(part) for part in removed)
+
+    # ==================== SYNC ====================
+    def _fetch_since(self, watermark: Optional[str]) -> List[Dict[str, Any]]:
+        """Baris transaction dengan created_at >= watermark, urut created_at"""
+        rows: List[Dict[str, Any]] = []
+        start = 0
+        while True:
+            query = self.client.table("transaction").select(", ".join(STORE_SCHEMA))
+            if watermark:
+                # gte: baris dengan created_at sama tidak terlewat (duplikat
+                # id dibuang di append)
+                query = query.gte("created_at", watermark)
+            page = (
+                query.order("created_at")
+                .order("id_transaction")
+                .range(start, start + _FETCH_PAGE_ROWS - 1)
+                .execute()
+                .data
+                or []
+            )
+            rows.extend(page)
+            if len(page) < _FETCH_PAGE_ROWS:
+                return rows
+            start += _FETCH_PAGE_ROWS
+
+    def sync(self, full: bool = False) -> Dict[str, Any]:
+        """
+        Tarik transaksi baru dari database
+        Args:
+            full: Bangun ulang seluruh store (menangkap juga update/delete
+                yang tidak lewat upload)
+        """
+        started = time.perf_counter()
+        with self._lock:
+            state = self._read_state()
+            if full:
+                self.clear()
+                state = {"watermark": None, "last_sync": None}
+
+            rows = self._fetch_since(state["watermark"])
+            added = 0
+            if rows:
+                frame = pl.DataFrame(rows, infer_schema_length=None)
+                added = self.append(frame)
+                state["watermark"] = (
+                    frame.get_column("created_at").cast(pl.String).max()
+                )
+            state["last_sync"] = time.time()
+            self._write_state(state)
+
+        return {
+            "fetched": len(rows),
+            "added": added,
+            "watermark": state["watermark"],
+            "elapsed_seconds": round(time.perf_counter() - started, 3),
+        }
+
+    def age(self) -> Optional[float]:
+        """Detik sejak sync terakhir (None kalau belum pernah sync)"""
+        last_sync = self._read_state().get("last_sync")
+        return time.time() - last_sync if last_sync else None
+
+    def ensure_fresh(self, max_age: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Sync incremental kalau sync terakhir lebih lama dari max_age detik
+        (default analytics_store_max_age, 0 = tidak pernah)
+        - Store yang belum ada tidak dibangun di sini
+        - Sync gagal: data lama tetap dipakai, error ikut dilaporkan
+        Returns:
+            {"store_age_seconds": ..., "synced": bool}
+        """
+        if max_age is None:
+            max_age = settings.analytics_store_max_age
+        synced, error = False, None
+        if max_age > 0 and self.exists():
+            with self._lock:
+                # Dicek ulang di dalam lock: request yang antre tidak sync lagi
+                age = self.age()
+                if age is None or age > max_age:
+                    try:
+                        self.sync()
+                        synced = True
+                    except Exception as e:
+                        error = str(e)
+
+        age = self.age()
+        result = {
+            "store_age_seconds": round(age, 1) if age is not None else None,
+            "synced": synced,
+        }
+        if error:
+            result["sync_error"] = error
+        return result
+
+    def clear(self) -> None:
+        with self._lock:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            if self.rollups is not None:
+                self.rollups.reset()
+
+    def rollup(self) -> RollupStore:
+        """Cube yang konsisten dengan store (dibangun dari Parquet kalau belum ada)"""
+        with self._lock:
+            if not self.rollups.exists() and self.exists():
+                self.rollups.rebuild(self.scan())
+        return self.rollups
+
+    # ==================== READ ====================
+    def exists(self) -> bool:
+        return os.path.isdir(self.directory) and any(
+            name.startswith("id_retailer=") for name in os.listdir(self.directory)
+        )
+
+    def _scan_partitions(self) -> pl.LazyFrame:
+        """Scan semua file dengan kolom partisi id_retailer dan month"""
+        return pl.scan_parquet(
+            os.path.join(self.directory, "**", "*.parquet"),
+            hive_partitioning=True,
+            hive_schema=HIVE_SCHEMA,
+        )
+
+    def scan(
+        self,
+        id_retailer: Optional[int] = None,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        month: Optional[str] = None,
+    ) -> pl.LazyFrame:
+        """
+        LazyFrame semua transaksi tersimpan
+        Filter retailer/bulan dipasang di kolom partisi supaya file di luar
+        rentang tidak dibaca sama sekali
+        Args:
+            month: Hanya partisi bulan ini (YYYY-MM)
+        """
+        if not self.exists():
+            return pl.LazyFrame(schema=STORE_SCHEMA)
+
+        lf = self._scan_partitions()
+        if id_retailer is not None:
+            lf = lf.filter(pl.col("id_retailer") == id_retailer)
+        if month is not None:
+            lf = lf.filter(pl.col("month") == month)
+        if start is not None:
+            lf = lf.filter(
+                (pl.col("month") >= start.strftime("%Y-%m"))
+                & (pl.col("invoice_date") >= start)
+            )
+        if end is not None:
+            lf = lf.filter(
+                (pl.col("month") <= end.strftime("%Y-%m"))
+                & (pl.col("invoice_date") <= end)
+            )
+        return lf.drop("month")
+
+    def page(
+        self,
+        after: Optional[Tuple[date, int]] = None,
+        limit: Optional[int] = None,
+        id_retailer: Optional[int] = None,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        month: Optional[str] = None,
+    ) -> pl.LazyFrame:
+        """
+        Keyset pagination urut (invoice_date, id_transaction)
+        Args:
+            after: Kunci baris terakhir halaman sebelumnya (None = awal)
+            limit: Jumlah baris (None = semua sisa baris)
+            month: Hanya partisi bulan ini (lihat months())
+        """
+        lf = self.scan(id_retailer, start, end, month)
+        if after is not None:
+            after_date, after_id = after
+            lf = lf.filter(
+                (pl.col("invoice_date") > after_date)
+                | (
+                    (pl.col("invoice_date") == after_date)
+                    & (pl.col("id_transaction") > after_id)
+                )
+            )
+        lf = lf.sort(PAGE_KEYS, nulls_last=True)
+        # sort + head dijalankan sebagai top-k, bukan sort penuh
+        return lf.head(limit) if limit is not None else lf
+
+    def months(
+        self,
+        id_retailer: Optional[int] = None,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+    ) -> List[str]:
+        """
+        Bulan (YYYY-MM) yang punya partisi, urut naik
+        Urutan invoice_date antar bulan sudah pasti, jadi hasil yang diurutkan
+        per bulan bisa disambung tanpa sort seluruh tabel
+        """
+        first_month = start.strftime("%Y-%m") if start else None
+        last_month = end.strftime("%Y-%m") if end else None
+        months = set()
+        for retailer_dir in os.listdir(self.directory) if self.exists() else []:
+            if not retailer_dir.startswith("id_retailer="):
+                continue
+            if id_retailer is not None and retailer_dir != f"id_retailer={id_retailer}":
+                continue
+            for month_dir in os.listdir(os.path.join(self.directory, retailer_dir)):
+                month = month_dir.split("=", 1)[1]
+                if (first_month and month < first_month) or (
+                    last_month and month > last_month
+                ):
+                    continue
+                months.add(month)
+        return sorted(months)
+
+    def iter_batches(
+        self,
+        id_retailer: Optional[int] = None,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        batch_rows: Optional[int] = None,
+    ) -> Iterator[pl.DataFrame]:
+        """
+        Baca transaksi per batch (paling banyak batch_rows baris di memori)
+        Partisi di luar filter retailer/bulan tidak dibuka sama sekali
+        """
+        batch_rows = batch_rows or settings.export_batch_rows
+        first_month = start.strftime("%Y-%m") if start else None
+        last_month = end.strftime("%Y-%m") if end else None
+        columns = [c for c in STORE_SCHEMA if c != "id_retailer"]
+
+        for retailer_dir in sorted(os.listdir(self.directory) if self.exists() else []):
+            if not retailer_dir.startswith("id_retailer="):
+                continue
+            retailer = int(retailer_dir.split("=", 1)[1])
+            if id_retailer is not None and retailer != id_retailer:
+                continue
+            for month_dir in sorted(
+                os.listdir(os.path.join(self.directory, retailer_dir))
+            ):
+                month = month_dir.split("=", 1)[1]
+                if (first_month and month < first_month) or (
+                    last_month and month > last_month
+                ):
+                    continue
+                path = os.path.join(self.directory, retailer_dir, month_dir)
+                for name in sorted(os.listdir(path)):
+                    if not name.endswith(".parquet"):
+                        continue
+                    parquet = pq.ParquetFile(os.path.join(path, name))
+                    for record_batch in parquet.iter_batches(
+                        batch_size=batch_rows, columns=columns
+                    ):
+                        batch = pl.from_arrow(record_batch).with_columns(
+                            id_retailer=pl.lit(retailer, pl.Int64)
+                        )
+                        if start is not None:
+                            batch = batch.filter(pl.col("invoice_date") >= start)
+                        if end is not None:
+                            batch = batch.filter(pl.col("invoice_date") <= end)
+                        if not batch.is_empty():
+                            yield batch.select(list(STORE_SCHEMA))
+
+    def stats(self) -> Dict[str, Any]:
+        state = self._read_state()
+        partitions = 0
+        files = 0
+        size = 0
+        for root, _, names in os.walk(self.directory):
+            parquet = [n for n in names if n.endswith(".parquet")]
+            if parquet:
+                partitions += 1
+                files += len(parquet)
+                size += sum(os.path.getsize(os.path.join(root, n)) for n in parquet)
+        return {
+            "partitions": partitions,
+            "files": files,
+            "size_bytes": size,
+            "watermark": state.get("watermark"),
+            "last_sync": state.get("last_sync"),
+            "age_seconds": (
+                round(time.time() - state["last_sync"], 1)
+                if state.get("last_sync")
+                else None
+            ),
+        }
+
+
+analytics_store = AnalyticsStore(
+    supabase,
+    directory=os.path.join(settings.data_dir, "analytics"),
+    rollups=rollup_store,
+)
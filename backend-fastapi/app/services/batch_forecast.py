@@ -0,0 +1,193 @@
+import asyncio
+import os
+import threading
+import time
+import orjson
+import polars as pl
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date
+from typing import Any, AsyncIterator, Dict, List, Optional
+from app.config import settings
+from app.services.analytics_store import analytics_store
+from app.services.forecast_worker import (
+    BATCH_METHODS,
+    DATE_COLUMN,
+    WorkerContext,
+    forecast_partition,
+)
+from app.services.rollup_store import DIMENSION_KEYS
+
+BATCH_VALUES = ("total_sales", "unit_sold", "operating_profit")
+DEFAULT_GROUP_BY = ["retailer", "product", "method"]
+_PARTITION_SEED = 20240101
+
+
+class BatchForecaster:
+    """
+    Forecast semua kombinasi series (default retailer x product x method)
+    - Series dibagi ke partisi berdasarkan hash key; satu partisi = satu task
+      di ProcessPoolExecutor (spawn, satu proses per core)
+    - Hasil dikirim sebagai NDJSON begitu partisinya selesai
+    """
+
+    def __init__(self, workers: int = 0, partitions: int = 0):
+        self.workers = workers or os.cpu_count() or 1
+        self.partitions = partitions or self.workers * 2
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                threads = max(1, (os.cpu_count() or 1) // self.workers)
+                # fork + thread pool Polars bisa deadlock, jadi pakai spawn;
+                # batas thread Polars hanya diberikan ke proses worker
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=WorkerContext(threads)
+                )
+            return self._pool
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(cancel_futures=True)
+                self._pool = None
+
+    def split(self, df: pl.DataFrame, keys: List[str]) -> List[pl.DataFrame]:
+        """Bagi baris ke partisi; semua baris satu series masuk partisi yang sama"""
+        if not keys or df.is_empty():
+            return [df] if not df.is_empty() else []
+        return df.with_columns(
+            (pl.struct(keys).hash(_PARTITION_SEED) % self.partitions).alias("_part")
+        ).partition_by("_part", include_key=False, maintain_order=False)
+
+    def stream(
+        self,
+        method: str,
+        group_by: Optional[List[str]] = None,
+        value_column: str = "total_sales",
+        periods: int = 7,
+        params: Optional[Dict[str, Any]] = None,
+        id_retailer: Optional[int] = None,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+    ) -> AsyncIterator[bytes]:
+        """
+        Validasi argumen lalu kembalikan generator NDJSON
+        Baris: type=forecast (satu per series x step), type=partition (waktu
+        per partisi), dan terakhir type=summary
+        """
+        if method not in BATCH_METHODS:
+            raise ValueError(f"Metode tidak dikenal: {method}")
+        if value_column not in BATCH_VALUES:
+            raise ValueError(f"Kolom nilai tidak dikenal: {value_column}")
+        group_by = DEFAULT_GROUP_BY if group_by is None else group_by
+        unknown = [d for d in group_by if d not in DIMENSION_KEYS]
+        if unknown:
+            raise ValueError(f"Dimensi tidak dikenal: {', '.join(unknown)}")
+        keys = [DIMENSION_KEYS[d] for d in group_by]
+        return self._stream(
+            method,
+            keys,
+            value_column,
+            periods,
+            params or {},
+            id_retailer,
+            start,
+            end,
+        )
+
+    async def _stream(
+        self,
+        method: str,
+        keys: List[str],
+        value_column: str,
+        periods: int,
+        params: Dict[str, Any],
+        id_retailer: Optional[int],
+        start: Optional[date],
+        end: Optional[date],
+    ) -> AsyncIterator[bytes]:
+        started = time.perf_counter()
+        freshness = await asyncio.to_thread(analytics_store.ensure_fresh)
+        df = await asyncio.to_thread(
+            lambda: analytics_store.scan(id_retailer, start, end)
+            .select(*keys, DATE_COLUMN, value_column)
+            .collect()
+        )
+        parts = await asyncio.to_thread(self.split, df, keys)
+
+        executor = self._executor()
+        loop = asyncio.get_running_loop()
+        futures = [
+            loop.run_in_executor(
+                executor,
+                forecast_partition,
+                index,
+                part,
+                keys,
+                value_column,
+                method,
+                periods,
+                params,
+            )
+            for index, part in enumerate(parts)
+        ]
+
+        series = 0
+        failed = 0
+        broken = False
+        try:
+            for done in asyncio.as_completed(futures):
+                try:
+                    result = await done
+                except Exception as e:
+                    failed += 1
+                    broken = broken or isinstance(e, BrokenProcessPool)
+                    yield orjson.dumps({"type": "partition", "error": str(e)}) + b"\n"
+                    continue
+
+                forecast = result.pop("forecast")
+                series += result["series"]
+                if not forecast.is_empty():
+                    yield forecast.select(
+                        pl.lit("forecast").alias("type"),
+                        pl.lit(result["partition"]).alias("partition"),
+                        pl.all(),
+                    ).write_ndjson().encode()
+                yield orjson.dumps(
+                    {
+                        "type": "partition",
+                        **result,
+                        "elapsed": round(time.perf_counter() - started, 4),
+                    }
+                ) + b"\n"
+        finally:
+            # Client putus di tengah jalan: partisi yang belum jalan dibatalkan
+            for future in futures:
+                future.cancel()
+            if broken:
+                # Worker mati (misalnya OOM): request berikutnya pakai pool baru
+                self.shutdown()
+
+        yield orjson.dumps(
+            {
+                "type": "summary",
+                "method": method,
+                "keys": keys,
+                "value": value_column,
+                "rows": len(df),
+                "series": series,
+                "partitions": len(parts),
+                "failed_partitions": failed,
+                "workers": self.workers,
+                "seconds": round(time.perf_counter() - started, 4),
+                **freshness,
+            }
+        ) + b"\n"
+
+
+batch_forecaster = BatchForecaster(
+    workers=settings.forecast_workers, partitions=settings.forecast_partitions
+)
@@ -0,0 +1,129 @@
+import io
+import time
+import polars as pl
+from typing import Any, Callable, Dict, List, Optional
+from app.config import settings
+from app.services.row_hash_index import KEY_COLUMNS
+from app.services.transaction_mapper import TRANSACTION_COLUMNS
+
+STAGING_TABLE = "transaction_staging"
+
+
+class CopyBulkLoader:
+    """Bulk load tabel transaction lewat staging table + COPY FROM STDIN"""
+
+    def __init__(self, engine=None, chunk_rows: Optional[int] = None):
+        if engine is None:
+            # Import di sini: app.database butuh DATABASE_URL yang valid
+            from app.database import get_bulk_engine
+
+            engine = get_bulk_engine()
+        self.engine = engine
+        self.chunk_rows = chunk_rows or settings.copy_chunk_rows
+
+    @staticmethod
+    def is_enabled() -> bool:
+        return settings.upload_backend == "copy" and bool(settings.database_url)
+
+    def load(
+        self,
+        df: pl.DataFrame,
+        on_rows: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+        replace: bool = False,
+        on_deleted: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Load frame hasil TransactionMapper dalam satu transaksi database
+        - COPY (CSV) ke temp staging table per chunk
+        - replace: hapus dulu baris dengan natural key yang sama
+          (semi-join ke staging), masih di transaksi yang sama
+        - Satu INSERT ... SELECT dari staging ke transaction
+        - on_rows: terima baris yang tersimpan (INSERT ... RETURNING *)
+        - on_deleted: terima baris yang terhapus (DELETE ... RETURNING)
+        """
+        started = time.perf_counter()
+        columns = ", ".join(TRANSACTION_COLUMNS)
+
+        with self.engine.begin() as conn:
+            if conn.dialect.name == "postgresql":
+                conn.exec_driver_sql(
+                    f"CREATE TEMP TABLE {STAGING_TABLE} ON COMMIT DROP AS "
+                    f'SELECT {columns} FROM "transaction" WITH NO DATA'
+                )
+                self._copy_postgres(conn, df, columns)
+            else:
+                # Stand-in (SQLite dll): tanpa COPY, executemany ke staging
+                conn.exec_driver_sql(f"DROP TABLE IF EXISTS {STAGING_TABLE}")
+                conn.exec_driver_sql(
+                    f"CREATE TEMP TABLE {STAGING_TABLE} AS "
+                    f'SELECT {columns} FROM "transaction" WHERE 1 = 0'
+                )
+                placeholders = ", ".join("?" for _ in TRANSACTION_COLUMNS)
+                for chunk in df.iter_slices(self.chunk_rows):
+                    conn.exec_driver_sql(
+                        f"INSERT INTO {STAGING_TABLE} ({columns}) "
+                        f"VALUES ({placeholders})",
+                        chunk.rows(),
+                    )
+
+            deleted = []
+            if replace:
+                # Semi-join ke staging (setara DELETE ... USING di PostgreSQL)
+                matches = " AND ".join(
+                    f'"transaction".{c} IS NOT DISTINCT FROM s.{c}'
+                    for c in KEY_COLUMNS
+                )
+                result = conn.exec_driver_sql(
+                    f'DELETE FROM "transaction" WHERE EXISTS '
+                    f"(SELECT 1 FROM {STAGING_TABLE} AS s WHERE {matches}) "
+                    f"RETURNING *"
+                )
+                deleted = [dict(row) for row in result.mappings()]
+
+            returning = " RETURNING *" if on_rows else ""
+            result = conn.exec_driver_sql(
+                f'INSERT INTO "transaction" ({columns}) '
+                f"SELECT {columns} FROM {STAGING_TABLE}{returning}"
+            )
+            rows = [dict(row) for row in result.mappings()] if on_rows else None
+            if rows is not None:
+                saved = len(rows)
+            else:
+                saved = result.rowcount if result.rowcount >= 0 else len(df)
+
+            if conn.dialect.name != "postgresql":
+                conn.exec_driver_sql(f"DROP TABLE {STAGING_TABLE}")
+
+        # Baru diteruskan setelah commit berhasil
+        if on_rows:
+            on_rows(rows)
+        if on_deleted and deleted:
+            on_deleted(deleted)
+
+        elapsed = time.perf_counter() - started
+        return {
+            "backend": "copy",
+            "saved": saved,
+            "failed": len(df) - saved,
+            "deleted": len(deleted),
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_sec": round(saved / elapsed, 1) if elapsed > 0 else 0,
+        }
+
+    def _copy_postgres(self, conn, df: pl.DataFrame, columns: str) -> None:
+        sql = f"COPY {STAGING_TABLE} ({columns}) FROM STDIN WITH (FORMAT csv)"
+        cursor = conn.connection.driver_connection.cursor()
+        try:
+            if hasattr(cursor, "copy"):
+                # psycopg 3: satu COPY, data dikirim per chunk
+                with cursor.copy(sql) as copy:
+                    for chunk in df.iter_slices(self.chunk_rows):
+                        copy.write(chunk.write_csv(include_header=False))
+            else:
+                # psycopg2: satu COPY per chunk ke staging yang sama
+                for chunk in df.iter_slices(self.chunk_rows):
+                    cursor.copy_expert(
+                        sql, io.StringIO(chunk.write_csv(include_header=False))
+                    )
+        finally:
+            cursor.close()
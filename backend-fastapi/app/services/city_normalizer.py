@@ -0,0 +1,119 @@
+import re
+import polars as pl
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+class CityNormalizer:
+    """
+    Cocokkan nama kota mentah ke nama di tabel dimensi city
+    - Index trigram dibangun sekali dari daftar kota
+    - Yang dicocokkan hanya nilai kota unik dalam file, lalu hasilnya di-join
+      kembali ke semua baris
+    """
+
+    def __init__(self, names: Iterable[str], threshold: float = 0.5):
+        self.threshold = threshold
+        self.names: List[str] = []
+        self._exact: Dict[str, str] = {}
+        self._grams: Dict[str, List[int]] = defaultdict(list)
+        self._gram_counts: List[int] = []
+        self._memo: Dict[str, Optional[str]] = {}
+
+        for name in names:
+            self._add(name)
+
+    def _add(self, name: str) -> None:
+        key = self._key(name)
+        if not key or key in self._exact:
+            return
+        self._exact[key] = name
+        grams = self._trigrams(key)
+        idx = len(self.names)
+        self.names.append(name)
+        self._gram_counts.append(len(grams))
+        for gram in grams:
+            self._grams[gram].append(idx)
+        # Hasil "tidak mirip" yang lama bisa berubah dengan nama baru
+        self._memo.clear()
+
+    @staticmethod
+    def _key(name: str) -> str:
+        """Huruf kecil, tanpa tanda baca, spasi dirapikan"""
+        return _NON_ALNUM.sub(" ", str(name).casefold()).strip()
+
+    @staticmethod
+    def _trigrams(key: str) -> set:
+        padded = f"  {key} "
+        return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+    def match(self, raw: str) -> Optional[str]:
+        """Nama kota di dimensi untuk nilai mentah ini (None kalau tidak mirip)"""
+        key = self._key(raw)
+        if key in self._exact:
+            return self._exact[key]
+        if key in self._memo:
+            return self._memo[key]
+
+        grams = self._trigrams(key) if key else set()
+        shared = Counter(idx for gram in grams for idx in self._grams.get(gram, ()))
+        best, best_score = None, self.threshold
+        for idx, common in shared.items():
+            # Dice coefficient antar himpunan trigram
+            score = 2 * common / (len(grams) + self._gram_counts[idx])
+            if score >= best_score:
+                best, best_score = self.names[idx], score
+
+        self._memo[key] = best
+        return best
+
+    @classmethod
+    def cluster(cls, values: Iterable[str], threshold: float = 0.5) -> Dict[str, str]:
+        """
+        Kelompokkan nilai yang mirip satu sama lain (misalnya Ambn dan Ambon)
+        Urutan values = prioritas jadi perwakilan kelompok
+        Returns:
+            {nilai: perwakilan} untuk nilai yang bukan perwakilan
+        """
+        representatives = cls([], threshold)
+        result = {}
+        for value in values:
+            matched = representatives.match(value)
+            if matched is None:
+                representatives._add(value)
+            elif matched != value:
+                result[value] = matched
+        return result
+
+    def mapping(self, values: Iterable[str]) -> Dict[str, str]:
+        """{nilai mentah: nama dimensi} untuk nilai yang berubah saja"""
+        result = {}
+        for raw in values:
+            matched = self.match(raw)
+            if matched is not None and matched != raw:
+                result[raw] = matched
+        return result
+
+    def normalize(
+        self, cities: pl.Series, mapping: Optional[Dict[str, str]] = None
+    ) -> pl.Series:
+        """Ganti nama kota yang dikenali; yang tidak dikenali dibiarkan"""
+        if mapping is None:
+            mapping = self.mapping(cities.drop_nulls().unique())
+        if not mapping:
+            return cities
+
+        name = cities.name
+        lookup = pl.DataFrame(
+            {name: list(mapping), "_matched": list(mapping.values())},
+            schema={name: pl.String, "_matched": pl.String},
+        )
+        return (
+            cities.cast(pl.String)
+            .to_frame()
+            .join(lookup, on=name, how="left", maintain_order="left")
+            .select(pl.coalesce("_matched", name).alias(name))
+            .to_series()
+        )
@@ -0,0 +1,149 @@
+import threading
+import time
+import polars as pl
+from typing import Any, Dict, List, Optional
+from app.config import settings
+from app.services.city_normalizer import CityNormalizer
+from app.services.transaction_mapper import DIMENSIONS, TransactionMapper
+from app.supabase_client import supabase
+
+
+class DimensionCache:
+    """Cache tabel dimensi (city, method, product, retailer) untuk seluruh proses"""
+
+    def __init__(self, client, ttl: int = 300):
+        self.client = client
+        self.ttl = ttl
+        self._frames: Dict[str, pl.DataFrame] = {}
+        self._maps: Dict[str, Dict[str, int]] = {}
+        self._city_normalizer: Optional[CityNormalizer] = None
+        self._loaded_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _is_fresh(self, table: str) -> bool:
+        loaded_at = self._loaded_at.get(table)
+        return loaded_at is not None and time.monotonic() - loaded_at < self.ttl
+
+    def _store(self, table: str, frame: pl.DataFrame) -> None:
+        id_col, name_col, _ = DIMENSIONS[table]
+        self._frames[table] = frame
+        self._maps[table] = dict(zip(frame[name_col], frame[id_col]))
+        if table == "city":
+            self._city_normalizer = None
+
+    def _load(self, table: str) -> None:
+        id_col, name_col, _ = DIMENSIONS[table]
+        rows = (
+            self.client.table(table).select(f"{id_col}, {name_col}").execute().data
+            or []
+        )
+        self._store(table, TransactionMapper.dimension_frame(table, rows))
+        self._loaded_at[table] = time.monotonic()
+
+    def frame(self, table: str) -> pl.DataFrame:
+        """Frame (id, nama) untuk satu tabel dimensi, refresh kalau TTL habis"""
+        with self._lock:
+            if self._is_fresh(table):
+                self.hits += 1
+            else:
+                self.misses += 1
+                self._load(table)
+            return self._frames[table]
+
+    def frames(self) -> Dict[str, pl.DataFrame]:
+        """Semua frame dimensi, siap dipakai TransactionMapper.map_transactions"""
+        return {table: self.frame(table) for table in DIMENSIONS}
+
+    def mapping(self, table: str) -> Dict[str, int]:
+        """Dict {nama: id} untuk satu tabel dimensi"""
+        self.frame(table)
+        return self._maps[table]
+
+    def city_normalizer(self) -> CityNormalizer:
+        """Index nama kota, dibangun ulang hanya kalau tabel city berubah"""
+        frame = self.frame("city")
+        with self._lock:
+            if self._city_normalizer is None:
+                _, name_col, _ = DIMENSIONS["city"]
+                self._city_normalizer = CityNormalizer(
+                    frame[name_col], threshold=settings.city_match_threshold
+                )
+            return self._city_normalizer
+
+    def merge(self, table: str, rows: List[Dict[str, Any]]) -> None:
+        """Gabungkan anggota dimensi yang baru di-insert tanpa fetch ulang"""
+        if not rows:
+            return
+        new_frame = TransactionMapper.dimension_frame(table, rows)
+        with self._lock:
+            if table not in self._frames:
+                self._store(table, new_frame)
+                return
+            _, name_col, _ = DIMENSIONS[table]
+            merged = pl.concat([self._frames[table], new_frame]).unique(
+                subset=name_col, keep="last", maintain_order=True
+            )
+            self._store(table, merged)
+
+    def create_members(self, table: str, names: List[str]) -> List[Dict[str, Any]]:
+        """
+        Tambah anggota dimensi baru dengan satu upsert, lalu merge ke cache
+        (butuh unique index pada kolom nama, lihat supabase/schema.sql)
+        """
+        if not names:
+            return []
+        id_col, name_col, _ = DIMENSIONS[table]
+        rows = (
+            self.client.table(table)
+            .upsert([{name_col: name} for name in names], on_conflict=name_col)
+            .execute()
+            .data
+            or []
+        )
+        self.merge(table, rows)
+        return rows
+
+    def invalidate(self, table: Optional[str] = None) -> None:
+        """Paksa refresh pada akses berikutnya (satu tabel atau semua)"""
+        with self._lock:
+            tables = [table] if table else list(self._loaded_at)
+            for name in tables:
+                self._loaded_at.pop(name, None)
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Counter hit/miss dan umur tiap tabel"""
+        now = time.monotonic()
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0,
+            "invalidations": self.invalidations,
+            "ttl_seconds": self.ttl,
+            "tables": {
+                table: {
+                    "rows": len(frame),
+                    "age_seconds": (
+                        round(now - self._loaded_at[table], 1)
+                        if table in self._loaded_at
+                        else None
+                    ),
+                }
+                for table, frame in self._frames.items()
+            },
+        }
+
+
+dimension_cache = DimensionCache(supabase, ttl=settings.dimension_cache_ttl)
+
+
+def city_normalizer_or_none() -> Optional[CityNormalizer]:
+    """Normalizer kota untuk cleaning; None kalau tabel city tidak bisa diambil"""
+    try:
+        return dimension_cache.city_normalizer()
+    except Exception:
+        return None
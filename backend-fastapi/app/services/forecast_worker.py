@@ -0,0 +1,89 @@
+import multiprocessing.context
+import os
+import threading
+import time
+import polars as pl
+from typing import Any, Dict, List
+from app.services.forecasting import SMOOTHING_METHODS
+from app.services.polars_service import PolarsDataProcessor
+
+# Dijalankan di proses worker: modul ini sengaja hanya mengimpor Polars/NumPy
+# (tanpa Supabase/config) supaya proses spawn cepat siap
+
+BATCH_METHODS = (*SMOOTHING_METHODS, "moving_average", "linear_trend")
+DATE_COLUMN = "invoice_date"
+
+
+_ENV_LOCK = threading.Lock()
+
+
+class WorkerProcess(multiprocessing.context.SpawnProcess):
+    """
+    Proses spawn dengan POLARS_MAX_THREADS sendiri
+    Thread pool Polars dibentuk saat import, jadi batasnya harus ada di
+    environment waktu proses dibuat; environment proses API dikembalikan
+    setelah start supaya tidak bocor ke subprocess lain
+    """
+
+    threads = 1
+
+    def start(self) -> None:
+        with _ENV_LOCK:
+            previous = os.environ.get("POLARS_MAX_THREADS")
+            os.environ["POLARS_MAX_THREADS"] = str(self.threads)
+            try:
+                super().start()
+            finally:
+                if previous is None:
+                    del os.environ["POLARS_MAX_THREADS"]
+                else:
+                    os.environ["POLARS_MAX_THREADS"] = previous
+
+
+class WorkerContext(multiprocessing.context.SpawnContext):
+    """Context spawn untuk ProcessPoolExecutor yang membuat WorkerProcess"""
+
+    def __init__(self, threads: int):
+        super().__init__()
+        self.threads = threads
+
+    def Process(self, *args, **kwargs) -> WorkerProcess:
+        process = WorkerProcess(*args, **kwargs)
+        process.threads = self.threads
+        return process
+
+
+def forecast_partition(
+    index: int,
+    df: pl.DataFrame,
+    keys: List[str],
+    value_column: str,
+    method: str,
+    periods: int,
+    params: Dict[str, Any],
+) -> Dict[str, Any]:
+    """Forecast semua series dalam satu partisi, plus waktu dan ukurannya"""
+    start = time.perf_counter()
+    if method in SMOOTHING_METHODS:
+        forecast = PolarsDataProcessor.forecast_smoothing_grouped(
+            df, DATE_COLUMN, value_column, keys, method, periods, **params
+        )
+    elif method == "moving_average":
+        forecast = PolarsDataProcessor.forecast_moving_average_grouped(
+            df, DATE_COLUMN, value_column, keys, periods, **params
+        )
+    elif method == "linear_trend":
+        forecast = PolarsDataProcessor.forecast_linear_trend_grouped(
+            df, DATE_COLUMN, value_column, keys, periods, **params
+        )
+    else:
+        raise ValueError(f"Metode tidak dikenal: {method}")
+
+    return {
+        "partition": index,
+        "forecast": forecast,
+        "series": df.select(keys).n_unique() if keys else 1,
+        "rows": len(df),
+        "pid": os.getpid(),
+        "seconds": round(time.perf_counter() - start, 4),
+    }
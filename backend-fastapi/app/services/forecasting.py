@@ -0,0 +1,539 @@
+import re
+from statistics import NormalDist
+import numpy as np
+import polars as pl
+from typing import List, Optional, Sequence, Tuple, Union
+
+SMOOTHING_METHODS = ("ewma", "holt", "holt_winters")
+_INTERVAL = re.compile(r"^(\d+)([a-z]+)$")
+# Satuan durasi yang bermakna untuk kolom Date (invoice_date)
+DATE_UNITS = ("d", "w", "mo", "q", "y")
+
+
+def _keys(by: Union[str, Sequence[str], None]) -> List[str]:
+    if by is None:
+        return []
+    return [by] if isinstance(by, str) else list(by)
+
+
+class ForecastEngine:
+    """
+    Forecasting banyak series sekaligus (satu series per kombinasi `by`)
+    - Input: frame panjang (tidy) dengan kolom key, tanggal, dan nilai
+    - Output: frame tidy key x step dengan tanggal dan nilai forecast
+    - Transaksi diresample dulu ke satu titik per periode (interval, gap
+      diisi 0), jadi biaya model mengikuti jumlah periode, bukan baris
+    - Rekursi smoothing dijalankan per langkah waktu untuk semua series
+      sekaligus (matriks NumPy series x waktu), bukan per series
+    """
+
+    # ==================== RESAMPLING ====================
+    @staticmethod
+    def check_duration(value: str) -> str:
+        """Validasi durasi interval/window ("1d", "2w", "1mo") sebelum dipakai"""
+        match = _INTERVAL.match(value)
+        if (
+            match is None
+            or int(match.group(1)) == 0
+            or match.group(2) not in DATE_UNITS
+        ):
+            raise ValueError(
+                f"Durasi tidak valid: {value} (contoh: 1d, 2w, 1mo, 1q, 1y)"
+            )
+        return value
+
+    @staticmethod
+    def resample(
+        df: Union[pl.DataFrame, pl.LazyFrame],
+        date_column: str,
+        value_columns: Union[str, Sequence[str]],
+        by: Union[str, Sequence[str], None] = None,
+        every: str = "1d",
+        fill_gaps: bool = True,
+    ) -> pl.DataFrame:
+        """
+        Jumlahkan nilai per bucket waktu per series (group_by_dynamic)
+        - every: ukuran bucket ("1d", "1w", "1mo"); tanggal bucket = awal bucket
+        - fill_gaps: bucket tanpa transaksi di antara titik pertama dan
+          terakhir tiap series diisi 0
+        Returns:
+            Frame key..., date_column, value_columns (satu baris per bucket)
+        """
+        keys = _keys(by)
+        values = _keys(value_columns)
+        lf = df.lazy().select(
+            *keys, date_column, *[pl.col(v).cast(pl.Float64) for v in values]
+        )
+        if lf.collect_schema()[date_column] == pl.String:
+            lf = lf.with_columns(pl.col(date_column).str.to_datetime())
+        lf = lf.drop_nulls(date_column).sort(
+            [*keys, date_column], nulls_last=True, maintain_order=True
+        )
+
+        buckets = (
+            lf.group_by_dynamic(date_column, every=every, group_by=keys or None)
+            .agg(pl.col(v).sum() for v in values)
+            .collect()
+        )
+        if not fill_gaps or buckets.is_empty():
+            return buckets
+        return buckets.upsample(
+            date_column, every=every, group_by=keys or None, maintain_order=True
+        ).with_columns(pl.col(v).fill_null(0.0) for v in values)
+
+    # ==================== SERIES LAYOUT ====================
+    @staticmethod
+    def _prepare(
+        df: Union[pl.DataFrame, pl.LazyFrame],
+        date_column: str,
+        value_column: str,
+        keys: List[str],
+        every: Optional[str] = None,
+    ) -> pl.DataFrame:
+        """
+        Urutkan per series, buang nilai kosong, tambah nomor series/posisi
+        every: resample dulu ke bucket waktu (satu titik per periode)
+        """
+        if every is not None:
+            df = ForecastEngine.resample(df, date_column, value_column, keys, every)
+        lf = (
+            df.lazy()
+            .select(*keys, date_column, pl.col(value_column).cast(pl.Float64))
+            .drop_nulls([date_column, value_column])
+            .sort([*keys, date_column], nulls_last=True, maintain_order=True)
+        )
+        if keys:
+            new_series = pl.any_horizontal(
+                pl.col(k).ne_missing(pl.col(k).shift(1)) for k in keys
+            )
+            series_id = new_series.fill_null(True).cast(pl.Int64).cum_sum() - 1
+        else:
+            series_id = pl.lit(0, pl.Int64)
+        return (
+            lf.with_columns(series_id.alias("_series"))
+            .with_columns(pl.int_range(pl.len()).over("_series").alias("_pos"))
+            .collect()
+        )
+
+    @staticmethod
+    def _matrix(
+        prepared: pl.DataFrame, value_column: str
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Matriks nilai (series x waktu, rata kiri, NaN setelah akhir) + panjang"""
+        series = prepared["_series"].to_numpy()
+        pos = prepared["_pos"].to_numpy()
+        n_series = int(series.max()) + 1 if len(series) else 0
+        lengths = np.bincount(series, minlength=n_series)
+        values = np.full((n_series, int(lengths.max()) if n_series else 0), np.nan)
+        values[series, pos] = prepared[value_column].to_numpy()
+        return values, lengths
+
+    @staticmethod
+    def _future(
+        last: pl.DataFrame,
+        date_column: str,
+        periods: int,
+        interval: str,
+        forecasts: Optional[np.ndarray] = None,
+    ) -> pl.DataFrame:
+        """Frame tidy: satu baris per series x step, tanggal = last + step*interval"""
+        match = _INTERVAL.match(interval)
+        if match is None:
+            raise ValueError(f"Interval tidak valid: {interval}")
+        every, unit = int(match.group(1)), match.group(2)
+        steps = np.arange(1, periods + 1)
+        future = (
+            last.select(pl.exclude("_series", "_pos"))
+            .with_columns(step=pl.lit(steps.tolist(), pl.List(pl.Int64)))
+            .explode("step")
+            .with_columns(
+                pl.col(date_column).dt.offset_by(
+                    pl.format(f"{{}}{unit}", pl.col("step") * every)
+                )
+            )
+        )
+        if forecasts is None:
+            return future
+        return future.with_columns(forecast=pl.Series(forecasts.reshape(-1)))
+
+    # ==================== KERNELS ====================
+    @staticmethod
+    def _holt_winters(
+        values: np.ndarray,
+        lengths: np.ndarray,
+        periods: int,
+        alpha: float,
+        beta: float,
+        gamma: float,
+        season_length: Optional[int],
+    ) -> np.ndarray:
+        """
+        Holt (level + trend) dan Holt-Winters aditif untuk semua series
+        - season_length=None: tanpa musiman
+        - Series yang lebih pendek dari dua musim memakai Holt biasa
+        Returns:
+            Matriks forecast series x periods
+        """
+        n_series, n_steps = values.shape
+        if n_series == 0:
+            return np.empty((0, periods))
+        first = values[:, 0]
+        second = np.where(lengths > 1, values[:, min(1, n_steps - 1)], first)
+
+        m = season_length or 1
+        seasonal = np.zeros((n_series, m))
+        gammas = np.zeros(n_series)
+        # Trend awal dari dua titik pertama, level awal sebelum t=0
+        trend = second - first
+        level = first - trend
+
+        if season_length and n_steps >= 2 * m:
+            seasonal_ok = lengths >= 2 * m
+            first_season = values[:, :m].mean(axis=1)
+            second_season = values[:, m : 2 * m].mean(axis=1)
+            trend = np.where(seasonal_ok, (second_season - first_season) / m, trend)
+            level = np.where(seasonal_ok, first_season - trend, level)
+            seasonal = np.where(
+                seasonal_ok[:, None], values[:, :m] - first_season[:, None], 0.0
+            )
+            gammas = np.where(seasonal_ok, gamma, 0.0)
+
+        for t in range(n_steps):
+            active = t < lengths
+            y = values[:, t]
+            phase = t % m
+            season = seasonal[:, phase]
+            new_level = alpha * (y - season) + (1 - alpha) * (level + trend)
+            new_trend = beta * (new_level - level) + (1 - beta) * trend
+            new_season = gammas * (y - new_level) + (1 - gammas) * season
+            level = np.where(active, new_level, level)
+            trend = np.where(active, new_trend, trend)
+            seasonal[:, phase] = np.where(active, new_season, season)
+
+        horizon = np.arange(1, periods + 1)
+        # Fase musim untuk langkah ke-h setelah titik terakhir tiap series
+        phases = (lengths[:, None] - 1 + horizon[None, :]) % m
+        future_season = np.take_along_axis(seasonal, phases, axis=1)
+        return level[:, None] + trend[:, None] * horizon[None, :] + future_season
+
+    # ==================== SMOOTHING ====================
+    @staticmethod
+    def smoothing(
+        df: Union[pl.DataFrame, pl.LazyFrame],
+        date_column: str,
+        value_column: str,
+        by: Union[str, Sequence[str], None] = None,
+        method: str = "ewma",
+        periods: int = 7,
+        span: Optional[int] = None,
+        alpha: Optional[float] = None,
+        beta: float = 0.1,
+        gamma: float = 0.1,
+        season_length: int = 7,
+        interval: str = "1d",
+        resample: bool = True,
+    ) -> pl.DataFrame:
+        """
+        Exponential smoothing untuk semua series dalam satu panggilan
+        Args:
+            by: Kolom key series (misalnya ["id_retailer", "id_product"])
+            method: ewma (level saja), holt (level + trend), atau
+                holt_winters (level + trend + musiman aditif)
+            span: Span EWMA, alpha = 2 / (span + 1) (default periods * 2)
+            alpha, beta, gamma: Bobot level, trend, dan musiman
+            season_length: Panjang satu musim dalam jumlah titik
+            interval: Ukuran periode ("1d", "1w", "1mo"): bucket resampling
+                dan jarak tanggal forecast
+            resample: False kalau input sudah satu baris per periode
+        Returns:
+            Frame key..., date_column, step, forecast, method
+        """
+        if method not in SMOOTHING_METHODS:
+            raise ValueError(f"Metode tidak dikenal: {method}")
+        keys = _keys(by)
+        if alpha is None:
+            alpha = 2 / ((span or periods * 2) + 1)
+
+        prepared = ForecastEngine._prepare(
+            df, date_column, value_column, keys, interval if resample else None
+        )
+        last = prepared.group_by("_series", maintain_order=True).last()
+
+        if method == "ewma":
+            # ewm_mean tanpa adjust = rekursi EWMA yang dimulai dari nilai pertama
+            level = (
+                prepared.group_by("_series", maintain_order=True)
+                .agg(pl.col(value_column).ewm_mean(alpha=alpha, adjust=False).last())
+                .get_column(value_column)
+                .to_numpy()
+            )
+            forecasts = np.repeat(level[:, None], periods, axis=1)
+        else:
+            values, lengths = ForecastEngine._matrix(prepared, value_column)
+            forecasts = ForecastEngine._holt_winters(
+                values,
+                lengths,
+                periods,
+                alpha,
+                beta,
+                gamma,
+                season_length if method == "holt_winters" else None,
+            )
+
+        return (
+            ForecastEngine._future(
+                last.drop(value_column), date_column, periods, interval, forecasts
+            )
+            .with_columns(method=pl.lit(method))
+            .select(*keys, date_column, "step", "forecast", "method")
+        )
+
+    # ==================== MOVING AVERAGE ====================
+    @staticmethod
+    def _rolling_expr(
+        value_column: str,
+        date_column: str,
+        window: Union[int, str],
+        weights: Optional[Sequence[float]] = None,
+        center: bool = False,
+    ) -> pl.Expr:
+        """
+        Rolling mean O(n) per series
+        - window int: jumlah titik (window awal series boleh belum penuh)
+        - window str ("28d", "4w"): rentang waktu pada tanggal invoice yang
+          tidak beraturan
+        """
+        value = pl.col(value_column)
+        if isinstance(window, str):
+            if weights is not None or center:
+                raise ValueError(
+                    "weights/center hanya untuk window berupa jumlah titik"
+                )
+            return value.rolling_mean_by(date_column, window_size=window)
+        if weights is not None and len(weights) != window:
+            raise ValueError("Panjang weights harus sama dengan window")
+        return value.rolling_mean(
+            window,
+            weights=list(weights) if weights is not None else None,
+            min_samples=1,
+            center=center,
+        )
+
+    @staticmethod
+    def rolling(
+        df: Union[pl.DataFrame, pl.LazyFrame],
+        date_column: str,
+        value_column: str,
+        by: Union[str, Sequence[str], None] = None,
+        window: Union[int, str] = 7,
+        weights: Optional[Sequence[float]] = None,
+        center: bool = False,
+        interval: str = "1d",
+        resample: bool = True,
+    ) -> pl.DataFrame:
+        """
+        Moving average historis untuk semua series sekaligus
+        Returns:
+            Frame key..., date_column, value_column, moving_average
+        """
+        keys = _keys(by)
+        prepared = ForecastEngine._prepare(
+            df, date_column, value_column, keys, interval if resample else None
+        )
+        return prepared.select(
+            *keys,
+            date_column,
+            value_column,
+            ForecastEngine._rolling_expr(
+                value_column, date_column, window, weights, center
+            )
+            .over("_series")
+            .alias("moving_average"),
+        )
+
+    @staticmethod
+    def moving_average(
+        df: Union[pl.DataFrame, pl.LazyFrame],
+        date_column: str,
+        value_column: str,
+        by: Union[str, Sequence[str], None] = None,
+        periods: int = 7,
+        window: Union[int, str] = 7,
+        weights: Optional[Sequence[float]] = None,
+        interval: str = "1d",
+        resample: bool = True,
+    ) -> pl.DataFrame:
+        """
+        Forecast = moving average trailing di titik terakhir tiap series
+        (window center hanya untuk smoothing historis, lihat rolling())
+        Returns:
+            Frame key..., date_column, step, forecast, method
+        """
+        keys = _keys(by)
+        prepared = ForecastEngine._prepare(
+            df, date_column, value_column, keys, interval if resample else None
+        )
+        last = (
+            prepared.with_columns(
+                ForecastEngine._rolling_expr(value_column, date_column, window, weights)
+                .over("_series")
+                .alias("_level")
+            )
+            .group_by("_series", maintain_order=True)
+            .last()
+        )
+        level = last["_level"].to_numpy()
+        forecasts = np.repeat(level[:, None], periods, axis=1)
+        return (
+            ForecastEngine._future(
+                last.drop(value_column, "_level"),
+                date_column,
+                periods,
+                interval,
+                forecasts,
+            )
+            .with_columns(method=pl.lit("moving_average"))
+            .select(*keys, date_column, "step", "forecast", "method")
+        )
+
+    # ==================== LINEAR TREND ====================
+    @staticmethod
+    def linear_fit(
+        df: Union[pl.DataFrame, pl.LazyFrame],
+        date_column: str,
+        value_column: str,
+        by: Union[str, Sequence[str], None] = None,
+        interval: str = "1d",
+        resample: bool = True,
+    ) -> pl.DataFrame:
+        """
+        OLS y = intercept + slope * x per series (x = urutan periode 0..n-1)
+        Semua series dihitung dalam satu group_by dari jumlah-jumlah closed form
+        Returns:
+            Frame key..., n, slope, intercept, residual_std, r2, x_mean, sxx,
+            dan titik terakhir (date_column)
+        """
+        keys = _keys(by)
+        prepared = ForecastEngine._prepare(
+            df, date_column, value_column, keys, interval if resample else None
+        )
+        return ForecastEngine._fit(prepared, date_column, value_column, keys)
+
+    @staticmethod
+    def _fit(
+        prepared: pl.DataFrame, date_column: str, value_column: str, keys: List[str]
+    ) -> pl.DataFrame:
+        x = pl.col("_pos").cast(pl.Float64)
+        y = pl.col(value_column)
+        sums = prepared.group_by("_series", maintain_order=True).agg(
+            *[pl.col(k).first() for k in keys],
+            pl.col(date_column).last(),
+            pl.len().alias("n"),
+            x.mean().alias("x_mean"),
+            y.mean().alias("y_mean"),
+            ((x - x.mean()) ** 2).sum().alias("sxx"),
+            ((x - x.mean()) * (y - y.mean())).sum().alias("sxy"),
+            ((y - y.mean()) ** 2).sum().alias("syy"),
+        )
+        slope = (
+            pl.when(pl.col("sxx") > 0)
+            .then(pl.col("sxy") / pl.col("sxx"))
+            .otherwise(0.0)
+        )
+        sse = (pl.col("syy") - pl.col("slope") * pl.col("sxy")).clip(lower_bound=0)
+        return (
+            sums.with_columns(slope.alias("slope"))
+            .with_columns(
+                (pl.col("y_mean") - pl.col("slope") * pl.col("x_mean")).alias(
+                    "intercept"
+                ),
+                pl.when(pl.col("n") > 2)
+                .then((sse / (pl.col("n") - 2)).sqrt())
+                .otherwise(0.0)
+                .alias("residual_std"),
+                pl.when(pl.col("syy") > 0).then(1 - sse / pl.col("syy")).alias("r2"),
+            )
+            .drop("y_mean", "sxy", "syy")
+        )
+
+    @staticmethod
+    def linear_trend(
+        df: Union[pl.DataFrame, pl.LazyFrame],
+        date_column: str,
+        value_column: str,
+        by: Union[str, Sequence[str], None] = None,
+        periods: int = 7,
+        confidence: float = 0.95,
+        interval: str = "1d",
+        resample: bool = True,
+        non_negative: bool = True,
+    ) -> pl.DataFrame:
+        """
+        Forecast trend linier + prediction interval untuk semua series
+        - Interval: yhat +- z * s * sqrt(1 + 1/n + (x0 - x_mean)^2 / sxx),
+          z dari distribusi normal (pendekatan untuk n kecil)
+        - non_negative: forecast dan batas bawah tidak di bawah 0
+        Returns:
+            Frame key..., date_column, step, forecast, lower, upper, method
+        """
+        keys = _keys(by)
+        fit = ForecastEngine.linear_fit(
+            df, date_column, value_column, keys, interval, resample
+        )
+        z = NormalDist().inv_cdf(0.5 + confidence / 2)
+
+        x0 = pl.col("n") - 1 + pl.col("step")
+        spread = (
+            pl.lit(z)
+            * pl.col("residual_std")
+            * (
+                1
+                + 1 / pl.col("n")
+                + pl.when(pl.col("sxx") > 0)
+                .then((x0 - pl.col("x_mean")) ** 2 / pl.col("sxx"))
+                .otherwise(0.0)
+            ).sqrt()
+        )
+        bounded = [
+            (pl.col(c).clip(lower_bound=0) if non_negative else pl.col(c))
+            for c in ("forecast", "lower", "upper")
+        ]
+        return (
+            ForecastEngine._future(fit, date_column, periods, interval)
+            .with_columns(
+                (pl.col("intercept") + pl.col("slope") * x0).alias("forecast")
+            )
+            .with_columns(
+                (pl.col("forecast") - spread).alias("lower"),
+                (pl.col("forecast") + spread).alias("upper"),
+            )
+            .with_columns(bounded)
+            .with_columns(method=pl.lit("linear_trend"))
+            .select(
+                *keys,
+                date_column,
+                "step",
+                "forecast",
+                "lower",
+                "upper",
+                "method",
+            )
+        )
+
+    @staticmethod
+    def downsample(
+        df: pl.DataFrame,
+        by: Union[str, Sequence[str], None] = None,
+        max_points: int = 200,
+    ) -> pl.DataFrame:
+        """
+        Ambil paling banyak max_points baris per series, tersebar rata
+        (baris pertama dan terakhir tiap series selalu ikut)
+        """
+        keys = _keys(by)
+        pos = pl.int_range(pl.len())
+        n = pl.len()
+        if keys:
+            pos, n = pos.over(keys), n.over(keys)
+        stride = ((n - 1) / max(max_points - 1, 1)).ceil().clip(lower_bound=1)
+        return df.filter((pos % stride == 0) | (pos == n - 1))
@@ -0,0 +1,114 @@
+import asyncio
+import time
+import httpx
+import polars as pl
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+from app.config import settings
+
+# Thread pool bersama: client Supabase sync tidak boleh jalan di event loop
+_executor = ThreadPoolExecutor(
+    max_workers=max(1, settings.insert_concurrency), thread_name_prefix="insert"
+)
+
+# Gagal sebelum request terkirim: aman diulang. Error lain (read timeout,
+# koneksi putus, 5xx dari gateway) bisa terjadi setelah commit, jadi insert
+# ulang bisa menggandakan batch
+RETRYABLE_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class InsertPipeline:
+    """Insert batch ke Supabase secara paralel dengan concurrency terbatas dan retry"""
+
+    def __init__(
+        self,
+        client,
+        table: str = "transaction",
+        batch_size: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        retry_backoff: Optional[float] = None,
+    ):
+        self.client = client
+        self.table = table
+        self.batch_size = batch_size or settings.insert_batch_size
+        self.concurrency = concurrency or settings.insert_concurrency
+        self.max_retries = (
+            settings.insert_max_retries if max_retries is None else max_retries
+        )
+        self.retry_backoff = (
+            settings.insert_retry_backoff if retry_backoff is None else retry_backoff
+        )
+
+    def _insert_batch(self, batch: pl.DataFrame) -> List[Dict[str, Any]]:
+        """
+        Insert satu batch (jalan di thread), retry dengan exponential backoff
+        hanya untuk RETRYABLE_ERRORS; batch yang gagal dengan error lain
+        dilaporkan sebagai failed (upload ulang dilewati oleh row hash index
+        untuk baris yang ternyata sudah tersimpan)
+        Returns:
+            Baris yang tersimpan, seperti dikembalikan database
+        """
+        payload = batch.to_dicts()
+        attempt = 0
+        while True:
+            try:
+                result = self.client.table(self.table).insert(payload).execute()
+                return result.data or []
+            except RETRYABLE_ERRORS:
+                if attempt >= self.max_retries:
+                    raise
+                time.sleep(self.retry_backoff * (2**attempt))
+                attempt += 1
+
+    async def run(
+        self,
+        df: pl.DataFrame,
+        on_progress: Optional[Callable[[int], None]] = None,
+        on_rows: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Insert seluruh frame per batch
+        Args:
+            df: Frame dengan kolom tabel tujuan (hasil TransactionMapper)
+            on_progress: Callback dengan jumlah baris tersimpan sejauh ini
+            on_rows: Callback dengan baris tersimpan per batch (termasuk id)
+        """
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        started = time.perf_counter()
+        saved = 0
+        failed_batches: List[Dict[str, Any]] = []
+
+        async def insert_at(offset: int) -> None:
+            nonlocal saved
+            async with semaphore:
+                batch = df.slice(offset, self.batch_size)
+                try:
+                    rows = await loop.run_in_executor(
+                        _executor, self._insert_batch, batch
+                    )
+                except Exception as e:
+                    failed_batches.append(
+                        {"offset": offset, "rows": len(batch), "error": str(e)}
+                    )
+                    return
+                saved += len(rows)
+                if on_rows:
+                    on_rows(rows)
+                if on_progress:
+                    on_progress(saved)
+
+        await asyncio.gather(
+            *(insert_at(offset) for offset in range(0, len(df), self.batch_size))
+        )
+
+        elapsed = time.perf_counter() - started
+        return {
+            "saved": saved,
+            "failed": sum(b["rows"] for b in failed_batches),
+            "batches": -(-len(df) // self.batch_size),
+            "failed_batches": sorted(failed_batches, key=lambda b: b["offset"]),
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_sec": round(saved / elapsed, 1) if elapsed > 0 else 0,
+        }
@@ -1,8 +1,9 @@
 import polars as pl
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Union
 from datetime import datetime, timedelta
 import io
 import json
+from app.services.forecasting import ForecastEngine
 
 
 class PolarsDataProcessor:
@@ -93,6 +94,46 @@ class PolarsDataProcessor:
         df.write_ipc(buffer)
         return buffer.getvalue()
 
+    # ==================== STREAMING EXPORT ====================
+    # Versi chunked dari export_to_*: hanya satu batch di memori sekaligus
+
+    @staticmethod
+    def stream_csv(batches: Iterable[pl.DataFrame]) -> Iterator[bytes]:
+        """CSV per batch (header hanya di batch pertama)"""
+        first = True
+        for batch in batches:
+            yield batch.write_csv(include_header=first).encode()
+            first = False
+
+    @staticmethod
+    def stream_ndjson(batches: Iterable[pl.DataFrame]) -> Iterator[bytes]:
+        """NDJSON per batch"""
+        for batch in batches:
+            yield batch.write_ndjson().encode()
+
+    @staticmethod
+    def stream_ipc(
+        batches: Iterable[pl.DataFrame], schema: Dict[str, Any]
+    ) -> Iterator[bytes]:
+        """Satu Arrow IPC stream utuh, dikirim per record batch"""
+        import pyarrow as pa
+
+        arrow_schema = pl.DataFrame(schema=schema).to_arrow().schema
+        sink = io.BytesIO()
+        with pa.ipc.new_stream(sink, arrow_schema) as writer:
+            for batch in batches:
+                for record_batch in batch.to_arrow().cast(arrow_schema).to_batches():
+                    writer.write_batch(record_batch)
+                yield sink.getvalue()
+                sink.seek(0)
+                sink.truncate()
+        yield sink.getvalue()
+
+    @staticmethod
+    def sink_parquet_file(lf: pl.LazyFrame, file_path: str) -> None:
+        """Tulis LazyFrame ke Parquet lewat streaming engine (tanpa collect penuh)"""
+        lf.sink_parquet(file_path)
+
     # ==================== DATA CLEANSING ====================
     @staticmethod
     def clean_delivery_data(df: pl.DataFrame) -> pl.DataFrame:
@@ -268,32 +309,49 @@ class PolarsDataProcessor:
 
     # ==================== ANALYTICS EXISTING ====================
     @staticmethod
-    def get_sales_summary(df: pl.DataFrame) -> Dict[str, Any]:
-        """Mendapatkan ringkasan penjualan"""
-        if df.is_empty():
-            return {
-                "total_orders": 0,
-                "total_revenue": 0,
-                "average_order": 0,
-                "min_order": 0,
-                "max_order": 0,
-            }
+    def get_sales_summary(df: Union[pl.DataFrame, pl.LazyFrame]) -> Dict[str, Any]:
+        """
+        Mendapatkan ringkasan penjualan dari kolom transaction
+        (total_sales, operating_profit); LazyFrame diagregasi tanpa
+        memuat baris ke memori
+        """
+        row = (
+            df.lazy()
+            .select(
+                pl.len().alias("total_orders"),
+                pl.col("total_sales").sum().alias("total_revenue"),
+                pl.col("operating_profit").sum().alias("total_profit"),
+                pl.col("total_sales").min().alias("min_order"),
+                pl.col("total_sales").max().alias("max_order"),
+            )
+            .collect()
+            .row(0, named=True)
+        )
+        return PolarsDataProcessor._summary_dict(
+            row["total_orders"],
+            row["total_revenue"],
+            row["total_profit"],
+            row["min_order"],
+            row["max_order"],
+        )
 
-        return {
-            "total_orders": len(df),
-            "total_revenue": float(df["estimated_duration"].sum())
-            if "estimated_duration" in df.columns
-            else 0,
-            "average_order": float(df["estimated_duration"].mean())
-            if "estimated_duration" in df.columns
-            else 0,
-            "min_order": float(df["estimated_duration"].min())
-            if "estimated_duration" in df.columns
-            else 0,
-            "max_order": float(df["estimated_duration"].max())
-            if "estimated_duration" in df.columns
-            else 0,
+    @staticmethod
+    def _summary_dict(
+        total_orders, total_revenue, total_profit, min_order=None, max_order=None
+    ) -> Dict[str, Any]:
+        """Bentuk hasil summary; min/max hanya ada kalau sumbernya punya"""
+        total_orders = int(total_orders or 0)
+        total_revenue = float(total_revenue or 0)
+        summary = {
+            "total_orders": total_orders,
+            "total_revenue": total_revenue,
+            "total_profit": float(total_profit or 0),
+            "avg_order_value": total_revenue / total_orders if total_orders else 0,
         }
+        if min_order is not None or max_order is not None:
+            summary["min_order"] = float(min_order or 0)
+            summary["max_order"] = float(max_order or 0)
+        return summary
 
     @staticmethod
     def get_delivery_performance(df: pl.DataFrame) -> Dict[str, Any]:
@@ -409,6 +467,41 @@ class PolarsDataProcessor:
         return df.to_dicts()
 
     # ==================== FORECASTING ====================
+    # Versi satu series untuk route lama; banyak series sekaligus lewat
+    # ForecastEngine (app/services/forecasting.py)
+
+    @staticmethod
+    def _periods(
+        df: pl.DataFrame, date_column: str, value_column: str, interval: Optional[str]
+    ) -> pl.DataFrame:
+        """Satu baris per periode (jumlah nilai, periode kosong = 0), urut tanggal"""
+        if interval is None:
+            return (
+                df.select(date_column, pl.col(value_column).cast(pl.Float64))
+                .drop_nulls()
+                .sort(date_column, maintain_order=True)
+            )
+        return ForecastEngine.resample(df, date_column, value_column, every=interval)
+
+    @staticmethod
+    def forecast_smoothing_grouped(
+        df: Union[pl.DataFrame, pl.LazyFrame],
+        date_column: str,
+        value_column: str,
+        by: Union[str, List[str], None] = None,
+        method: str = "ewma",
+        periods: int = 7,
+        **params: Any,
+    ) -> pl.DataFrame:
+        """
+        EWMA / Holt / Holt-Winters untuk semua series (per key `by`) sekaligus
+        Returns:
+            Frame tidy key..., date_column, step, forecast, method
+        """
+        return ForecastEngine.smoothing(
+            df, date_column, value_column, by, method, periods, **params
+        )
+
     @staticmethod
     def forecast_exponential_smoothing(
         df: pl.DataFrame,
@@ -416,6 +509,7 @@ class PolarsDataProcessor:
         value_column: str,
         periods: int = 7,
         span: Optional[int] = None,
+        interval: Optional[str] = "1d",
     ) -> Dict[str, Any]:
         """
         Forecasting menggunakan Exponentially Weighted Moving Average
@@ -425,46 +519,35 @@ class PolarsDataProcessor:
             value_column: Nama kolom nilai yang akan diprediksi
             periods: Jumlah periode ke depan yang akan diprediksi
             span: Span untuk EWMA (jika None, menggunakan periods)
+            interval: Resample ke periode ini dulu ("1d", "1w", "1mo");
+                None kalau data sudah satu baris per periode
         """
         if date_column not in df.columns or value_column not in df.columns:
             return {"error": "Column not found"}
 
         try:
-            temp_df = df.clone()
-            temp_df = temp_df.sort(date_column)
+            temp_df = PolarsDataProcessor._periods(
+                df, date_column, value_column, interval
+            )
 
             if span is None:
                 span = min(periods * 2, len(temp_df))
 
-            values = temp_df[value_column].to_list()
-            dates = temp_df[date_column].to_list()
-
-            ewm_values = []
-            alpha = 2 / (span + 1)
-            for i, val in enumerate(values):
-                if i == 0:
-                    ewm_values.append(val)
-                else:
-                    ewm_value = alpha * val + (1 - alpha) * ewm_values[-1]
-                    ewm_values.append(ewm_value)
-
-            last_date = dates[-1]
-            if isinstance(last_date, str):
-                last_date = datetime.fromisoformat(last_date.replace("Z", ""))
-            elif hasattr(last_date, "timestamp"):
-                last_date = last_date
-
-            forecast_values = []
-            last_ewm = ewm_values[-1] if ewm_values else 0
-
-            for i in range(periods):
-                next_value = last_ewm
-                forecast_values.append(float(next_value))
-                last_ewm = next_value
+            # ewm_mean tanpa adjust: rekursi EWMA yang dimulai dari nilai pertama
+            fitted = temp_df.select(
+                pl.col(date_column),
+                pl.col(value_column).cast(pl.Float64),
+                pl.col(value_column)
+                .cast(pl.Float64)
+                .ewm_mean(alpha=2 / (span + 1), adjust=False)
+                .alias("_ewm"),
+            )
+            last_ewm = fitted["_ewm"][-1] if len(fitted) else 0
+            forecast_values = [float(last_ewm)] * periods
 
             historical = [
                 {"date": str(d), "actual": float(v), "forecast": float(f)}
-                for d, v, f in zip(dates[-span:], values[-span:], ewm_values[-span:])
+                for d, v, f in fitted.tail(span).iter_rows()
             ]
 
             return {
@@ -478,13 +561,36 @@ class PolarsDataProcessor:
         except Exception as e:
             return {"error": str(e)}
 
+    @staticmethod
+    def forecast_moving_average_grouped(
+        df: Union[pl.DataFrame, pl.LazyFrame],
+        date_column: str,
+        value_column: str,
+        by: Union[str, List[str], None] = None,
+        periods: int = 7,
+        window: Union[int, str] = 7,
+        **params: Any,
+    ) -> pl.DataFrame:
+        """
+        Moving average untuk semua series (per key `by`) sekaligus
+        window boleh jumlah titik (7) atau rentang waktu ("28d")
+        Returns:
+            Frame tidy key..., date_column, step, forecast, method
+        """
+        return ForecastEngine.moving_average(
+            df, date_column, value_column, by, periods, window, **params
+        )
+
     @staticmethod
     def forecast_moving_average(
         df: pl.DataFrame,
         date_column: str,
         value_column: str,
         periods: int = 7,
-        window: int = 7,
+        window: Union[int, str] = 7,
+        weights: Optional[List[float]] = None,
+        center: bool = False,
+        interval: Optional[str] = "1d",
     ) -> Dict[str, Any]:
         """
         Forecasting menggunakan Moving Average
@@ -493,35 +599,54 @@ class PolarsDataProcessor:
             date_column: Nama kolom tanggal
             value_column: Nama kolom nilai yang akan diprediksi
             periods: Jumlah periode ke depan yang akan diprediksi
-            window: Ukuran window untuk moving average
+            window: Ukuran window (jumlah titik) atau rentang waktu ("28d")
+            weights: Bobot per posisi window (weighted moving average)
+            center: Window di tengah untuk nilai historis
+            interval: Resample ke periode ini dulu; None = pakai baris apa adanya
         """
         if date_column not in df.columns or value_column not in df.columns:
             return {"error": "Column not found"}
 
         try:
-            temp_df = df.clone()
-            temp_df = temp_df.sort(date_column)
-
-            values = temp_df[value_column].to_list()
-            dates = temp_df[date_column].to_list()
-
-            window = min(window, len(values))
-
-            ma_values = []
-            for i in range(len(values)):
-                start = max(0, i - window + 1)
-                window_values = values[start : i + 1]
-                ma_values.append(sum(window_values) / len(window_values))
-
-            last_ma = sum(values[-window:]) / window
+            df = PolarsDataProcessor._periods(df, date_column, value_column, interval)
+            if isinstance(window, int):
+                window = min(window, len(df))
+                if weights is not None:
+                    weights = weights[-window:]
+
+            fitted = ForecastEngine.rolling(
+                df,
+                date_column,
+                value_column,
+                window=window,
+                weights=weights,
+                center=center,
+                interval=interval or "1d",
+                resample=False,
+            )
+            forecast = ForecastEngine.moving_average(
+                df,
+                date_column,
+                value_column,
+                periods=periods,
+                window=window,
+                weights=weights,
+                interval=interval or "1d",
+                resample=False,
+            )
+            forecast_values = forecast["forecast"].to_list()
 
-            forecast_values = [float(last_ma) for _ in range(periods)]
+            if isinstance(window, int):
+                recent = fitted.tail(window)
+            else:
+                last_date = fitted[date_column].max()
+                recent = fitted.filter(
+                    pl.col(date_column) > pl.lit(last_date).dt.offset_by(f"-{window}")
+                )
 
             historical = [
                 {"date": str(d), "actual": float(v), "forecast": float(f)}
-                for d, v, f in zip(
-                    dates[-window:], values[-window:], ma_values[-window:]
-                )
+                for d, v, f in recent.iter_rows()
             ]
 
             return {
@@ -535,12 +660,33 @@ class PolarsDataProcessor:
         except Exception as e:
             return {"error": str(e)}
 
+    @staticmethod
+    def forecast_linear_trend_grouped(
+        df: Union[pl.DataFrame, pl.LazyFrame],
+        date_column: str,
+        value_column: str,
+        by: Union[str, List[str], None] = None,
+        periods: int = 7,
+        **params: Any,
+    ) -> pl.DataFrame:
+        """
+        Trend linier (OLS) + prediction interval untuk semua series sekaligus
+        Returns:
+            Frame tidy key..., date_column, step, forecast, lower, upper, method
+        """
+        return ForecastEngine.linear_trend(
+            df, date_column, value_column, by, periods, **params
+        )
+
     @staticmethod
     def forecast_linear_trend(
         df: pl.DataFrame,
         date_column: str,
         value_column: str,
         periods: int = 7,
+        confidence: float = 0.95,
+        max_points: int = 200,
+        interval: Optional[str] = "1d",
     ) -> Dict[str, Any]:
         """
         Forecasting menggunakan Linear Trend
@@ -549,54 +695,54 @@ class PolarsDataProcessor:
             date_column: Nama kolom tanggal
             value_column: Nama kolom nilai yang akan diprediksi
             periods: Jumlah periode ke depan yang akan diprediksi
+            confidence: Tingkat kepercayaan prediction interval
+            max_points: Jumlah maksimum titik historical yang dikirim
+            interval: Resample ke periode ini dulu; None = pakai baris apa adanya
         """
         if date_column not in df.columns or value_column not in df.columns:
             return {"error": "Column not found"}
 
         try:
-            temp_df = df.clone()
-            temp_df = temp_df.sort(date_column)
-
-            values = temp_df[value_column].to_list()
-            dates = temp_df[date_column].to_list()
-
-            n = len(values)
-            x = list(range(n))
-            y = values
-
-            x_mean = sum(x) / n
-            y_mean = sum(y) / n
-
-            numerator = sum((x[i] - x_mean) * (y[i] - y_mean) for i in range(n))
-            denominator = sum((x[i] - x_mean) ** 2 for i in range(n))
-
-            if denominator == 0:
-                slope = 0
-            else:
-                slope = numerator / denominator
-
-            intercept = y_mean - slope * x_mean
-
-            fitted_values = [slope * xi + intercept for xi in x]
+            history = PolarsDataProcessor._periods(
+                df, date_column, value_column, interval
+            )
+            params = {"interval": interval or "1d", "resample": False}
+            fit = ForecastEngine.linear_fit(
+                history, date_column, value_column, **params
+            ).row(0, named=True)
+            forecast = ForecastEngine.linear_trend(
+                history,
+                date_column,
+                value_column,
+                periods=periods,
+                confidence=confidence,
+                **params,
+            )
+            slope, intercept = fit["slope"], fit["intercept"]
 
-            forecast_values = []
-            for i in range(periods):
-                next_x = n + i
-                next_value = slope * next_x + intercept
-                forecast_values.append(float(max(0, next_value)))
+            history = ForecastEngine.downsample(
+                history.with_row_index("_x").with_columns(
+                    (intercept + slope * pl.col("_x")).alias("_fitted")
+                ),
+                max_points=max_points,
+            )
 
             historical = [
                 {"date": str(d), "actual": float(v), "forecast": float(f)}
-                for d, v, f in zip(dates, values, fitted_values)
+                for _, d, v, f in history.iter_rows()
             ]
 
             return {
                 "success": True,
                 "historical": historical,
-                "forecast": forecast_values,
+                "forecast": forecast["forecast"].to_list(),
+                "lower": forecast["lower"].to_list(),
+                "upper": forecast["upper"].to_list(),
+                "confidence": confidence,
                 "method": "Linear Trend",
                 "slope": slope,
                 "intercept": intercept,
+                "r2": fit["r2"],
                 "periods": periods,
             }
         except Exception as e:
@@ -0,0 +1,198 @@
+import os
+import threading
+import uuid
+import polars as pl
+from datetime import date
+from typing import Any, Dict, List, Optional
+from app.config import settings
+
+# Grain cube: satu baris per retailer x product x method x city x hari
+CUBE_KEYS = ["id_retailer", "id_product", "id_method", "id_city", "invoice_date"]
+CUBE_SCHEMA = {
+    "id_retailer": pl.Int64,
+    "id_product": pl.Int64,
+    "id_method": pl.Int64,
+    "id_city": pl.Int64,
+    "invoice_date": pl.Date,
+    "total_sales": pl.Float64,
+    "operating_profit": pl.Float64,
+    "unit_sold": pl.Int64,
+    "margin_sum": pl.Float64,
+    "transactions": pl.Int64,
+}
+
+# Nama dimensi di query -> kolom cube
+DIMENSION_KEYS = {
+    "retailer": "id_retailer",
+    "product": "id_product",
+    "method": "id_method",
+    "city": "id_city",
+}
+TIME_GRAINS = {"day": "1d", "week": "1w", "month": "1mo", "quarter": "1q", "year": "1y"}
+
+
+class RollupStore:
+    """
+    Agregat transaksi per retailer/product/method/city/hari
+    - Diperbarui dari baris yang benar-benar masuk/keluar AnalyticsStore
+      (group_by batch lalu digabung ke cube), bukan dari raw row
+    - query() menjawab total per dimensi/periode dalam O(jumlah grup)
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._cube: Optional[pl.DataFrame] = None
+        self._lock = threading.Lock()
+
+    # ==================== MAINTENANCE ====================
+    def _load(self) -> pl.DataFrame:
+        if self._cube is None:
+            try:
+                self._cube = pl.read_parquet(self.path)
+            except (FileNotFoundError, OSError):
+                self._cube = pl.DataFrame(schema=CUBE_SCHEMA)
+        return self._cube
+
+    def _save(self, cube: pl.DataFrame) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{uuid.uuid4().hex}.tmp"
+        cube.write_parquet(tmp_path)
+        os.replace(tmp_path, self.path)
+        self._cube = cube
+
+    @staticmethod
+    def aggregate(rows: pl.DataFrame, sign: int = 1) -> pl.DataFrame:
+        """group_by satu batch transaksi ke grain cube (sign=-1 untuk baris terhapus)"""
+        return (
+            rows.lazy()
+            .group_by(CUBE_KEYS)
+            .agg(
+                pl.col("total_sales").cast(pl.Float64).fill_null(0).sum(),
+                pl.col("operating_profit").cast(pl.Float64).fill_null(0).sum(),
+                pl.col("unit_sold").cast(pl.Int64).fill_null(0).sum(),
+                pl.col("operating_margin")
+                .cast(pl.Float64)
+                .fill_null(0)
+                .sum()
+                .alias("margin_sum"),
+                pl.len().cast(pl.Int64).alias("transactions"),
+            )
+            .with_columns(
+                pl.col(c) * sign
+                for c in (
+                    "total_sales",
+                    "operating_profit",
+                    "unit_sold",
+                    "margin_sum",
+                    "transactions",
+                )
+            )
+            .select(pl.col(name).cast(dtype) for name, dtype in CUBE_SCHEMA.items())
+            .collect()
+        )
+
+    def apply(
+        self, added: pl.DataFrame, removed: Optional[pl.DataFrame] = None
+    ) -> None:
+        """Gabungkan agregat baris baru (dan kurangi baris terhapus) ke cube"""
+        deltas = []
+        if added is not None and not added.is_empty():
+            deltas.append(self.aggregate(added))
+        if removed is not None and not removed.is_empty():
+            deltas.append(self.aggregate(removed, sign=-1))
+        if not deltas:
+            return
+
+        with self._lock:
+            cube = (
+                pl.concat([self._load(), *deltas])
+                .group_by(CUBE_KEYS)
+                .agg(pl.exclude(CUBE_KEYS).sum())
+                .filter(pl.col("transactions") > 0)
+                .sort(CUBE_KEYS, nulls_last=True)
+            )
+            self._save(cube)
+
+    def rebuild(self, rows: pl.LazyFrame) -> None:
+        """Bangun ulang cube dari semua transaksi (misalnya setelah full sync)"""
+        with self._lock:
+            self._save(self.aggregate(rows.collect()).sort(CUBE_KEYS, nulls_last=True))
+
+    # ==================== QUERY ====================
+    def query(
+        self,
+        group_by: Optional[List[str]] = None,
+        grain: Optional[str] = None,
+        id_retailer: Optional[int] = None,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+    ) -> pl.DataFrame:
+        """
+        Total sales/profit/units/transaksi per dimensi dan periode
+        Args:
+            group_by: Subset dari retailer, product, method, city
+            grain: day, week, month, quarter, year (None = tanpa waktu)
+            id_retailer, start, end: Filter
+        """
+        group_by = group_by or []
+        unknown = [d for d in group_by if d not in DIMENSION_KEYS]
+        if unknown:
+            raise ValueError(f"Dimensi tidak dikenal: {', '.join(unknown)}")
+        if grain is not None and grain not in TIME_GRAINS:
+            raise ValueError(f"Grain tidak dikenal: {grain}")
+
+        lf = self._load().lazy()
+        if id_retailer is not None:
+            lf = lf.filter(pl.col("id_retailer") == id_retailer)
+        if start is not None:
+            lf = lf.filter(pl.col("invoice_date") >= start)
+        if end is not None:
+            lf = lf.filter(pl.col("invoice_date") <= end)
+
+        keys = [DIMENSION_KEYS[d] for d in group_by]
+        if grain is not None:
+            lf = lf.with_columns(
+                pl.col("invoice_date").dt.truncate(TIME_GRAINS[grain]).alias("period")
+            )
+            keys.append("period")
+
+        totals = [
+            pl.col("total_sales").sum(),
+            pl.col("operating_profit").sum(),
+            pl.col("unit_sold").sum(),
+            pl.col("transactions").sum(),
+            pl.col("margin_sum").sum(),
+        ]
+        lf = lf.group_by(keys).agg(totals) if keys else lf.select(totals)
+
+        return (
+            lf.with_columns(
+                (pl.col("margin_sum") / pl.col("transactions")).alias("avg_margin"),
+                pl.when(pl.col("total_sales") != 0)
+                .then(pl.col("operating_profit") / pl.col("total_sales"))
+                .alias("profit_margin"),
+            )
+            .drop("margin_sum")
+            .sort(keys or ["transactions"], nulls_last=True)
+            .collect()
+        )
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._save(pl.DataFrame(schema=CUBE_SCHEMA))
+
+    def stats(self) -> Dict[str, Any]:
+        cube = self._load()
+        return {
+            "groups": len(cube),
+            "transactions": int(cube["transactions"].sum()) if len(cube) else 0,
+            "size_bytes": (
+                os.path.getsize(self.path) if os.path.exists(self.path) else 0
+            ),
+        }
+
+
+rollup_store = RollupStore(os.path.join(settings.data_dir, "rollups", "cube.parquet"))
@@ -0,0 +1,292 @@
+import json
+import os
+import threading
+import time
+import uuid
+import polars as pl
+from typing import Any, Dict, Iterable, List, Optional
+from app.config import settings
+from app.supabase_client import supabase
+
+# Natural key satu transaksi dan nilai yang boleh dikoreksi (mode replace)
+KEY_COLUMNS = [
+    "id_retailer",
+    "id_city",
+    "id_product",
+    "id_method",
+    "invoice_date",
+    "price_per_unit",
+    "unit_sold",
+]
+VALUE_COLUMNS = ["total_sales", "operating_profit", "operating_margin"]
+
+# Hash Polars tidak dijamin stabil antar versi: index lama dibuang kalau beda
+HASH_SEED = 20240101
+HASH_VERSION = f"polars-{pl.__version__}-seed{HASH_SEED}"
+
+_FETCH_PAGE_ROWS = 1000
+# Natural key per request filter or=(and(...),...) (batas panjang URL)
+_KEY_FILTER_BATCH = 50
+_DELETE_BATCH = 500
+
+
+def _canonical(columns: Iterable[str]) -> list:
+    """Bentuk nilai yang sama untuk baris dari Excel maupun dari database"""
+    exprs = []
+    for c in columns:
+        if c == "invoice_date":
+            exprs.append(pl.col(c).cast(pl.String).str.slice(0, 10))
+        elif c.startswith("id_") or c == "unit_sold":
+            exprs.append(pl.col(c).cast(pl.Int64))
+        elif c == "operating_margin":
+            exprs.append(pl.col(c).cast(pl.Float64).round(4))
+        else:
+            # DECIMAL(15,2) di database
+            exprs.append(pl.col(c).cast(pl.Float64).round(2))
+    return exprs
+
+
+def with_row_hashes(df: pl.DataFrame) -> pl.DataFrame:
+    """Tambah kolom key_hash (natural key) dan value_hash (nilai) per baris"""
+    return df.with_columns(
+        pl.struct(_canonical(KEY_COLUMNS)).hash(HASH_SEED).alias("key_hash"),
+        pl.struct(_canonical(VALUE_COLUMNS)).hash(HASH_SEED).alias("value_hash"),
+    )
+
+
+class RowHashIndex:
+    """
+    Index hash transaksi yang sudah tersimpan, satu file Arrow per retailer
+    - Dipakai untuk upload ulang yang hanya menulis baris baru/berubah
+    - Kalau file belum ada, versi hash beda, atau jumlah baris / id terbesar
+      retailer di tabel transaction berubah (insert/hapus di luar upload ini),
+      index dibangun ulang dari tabel transaction
+    """
+
+    def __init__(self, client, directory: str):
+        self.client = client
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    def _path(self, id_retailer: int) -> str:
+        return os.path.join(self.directory, f"retailer_{id_retailer}.arrow")
+
+    def _meta_path(self, id_retailer: int) -> str:
+        return os.path.join(self.directory, f"retailer_{id_retailer}.json")
+
+    def _read(self, id_retailer: int) -> tuple:
+        """(index, meta); index None kalau belum ada atau versi hash beda"""
+        try:
+            with open(self._meta_path(id_retailer)) as f:
+                meta = json.load(f)
+            if meta.get("hash_version") != HASH_VERSION:
+                return None, {}
+            return pl.read_ipc(self._path(id_retailer)), meta
+        except (FileNotFoundError, OSError, ValueError):
+            return None, {}
+
+    def _write_meta(self, id_retailer: int, meta: Dict[str, Any]) -> None:
+        tmp_path = os.path.join(self.directory, f".{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self._meta_path(id_retailer))
+
+    def _write(
+        self, id_retailer: int, index: pl.DataFrame, fingerprint: Dict[str, Any]
+    ) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = os.path.join(self.directory, f".{uuid.uuid4().hex}.tmp")
+        index.write_ipc(tmp_path)
+        os.replace(tmp_path, self._path(id_retailer))
+        self._write_meta(
+            id_retailer,
+            {
+                "hash_version": HASH_VERSION,
+                "rows": len(index),
+                **fingerprint,
+                "checked_at": time.time(),
+            },
+        )
+
+    def _fingerprint(self, id_retailer: int) -> Dict[str, Any]:
+        """Jumlah baris dan id_transaction terbesar retailer di database"""
+        response = (
+            self.client.table("transaction")
+            .select("id_transaction", count="exact")
+            .eq("id_retailer", id_retailer)
+            .order("id_transaction", desc=True)
+            .limit(1)
+            .execute()
+        )
+        data = response.data or []
+        return {
+            "db_rows": response.count or 0,
+            "max_id": data[0]["id_transaction"] if data else None,
+        }
+
+    def _is_stale(self, id_retailer: int, meta: Dict[str, Any]) -> bool:
+        """
+        Cocokkan index dengan tabel transaction (paling sering sekali per
+        row_hash_index_check_seconds)
+        - Baris yang dihapus/ditambah di luar upload ini (misalnya route
+          Next.js) mengubah jumlah baris atau id terbesar
+        """
+        age = time.time() - meta.get("checked_at", 0)
+        if age < settings.row_hash_index_check_seconds:
+            return False
+        fingerprint = self._fingerprint(id_retailer)
+        if any(meta.get(k) != v for k, v in fingerprint.items()):
+            return True
+        self._write_meta(id_retailer, {**meta, "checked_at": time.time()})
+        return False
+
+    def _fetch(self, id_retailer: int) -> pl.DataFrame:
+        """Ambil natural key + nilai semua transaksi retailer (per halaman)"""
+        columns = KEY_COLUMNS + VALUE_COLUMNS
+        pages = []
+        start = 0
+        while True:
+            rows = (
+                self.client.table("transaction")
+                .select(", ".join(columns))
+                .eq("id_retailer", id_retailer)
+                .order("id_transaction")
+                .range(start, start + _FETCH_PAGE_ROWS - 1)
+                .execute()
+                .data
+                or []
+            )
+            if rows:
+                pages.append(pl.DataFrame(rows, infer_schema_length=None))
+            if len(rows) < _FETCH_PAGE_ROWS:
+                break
+            start += _FETCH_PAGE_ROWS
+
+        if not pages:
+            return pl.DataFrame(schema={c: pl.String for c in columns})
+        return pl.concat(pages, how="diagonal_relaxed")
+
+    def get(self, id_retailer: int) -> pl.DataFrame:
+        """Frame (key_hash, value_hash) untuk satu retailer"""
+        with self._lock:
+            index, meta = self._read(id_retailer)
+            if index is None or self._is_stale(id_retailer, meta):
+                # Fingerprint diambil sebelum fetch: perubahan di tengah
+                # fetch terdeteksi pada pengecekan berikutnya
+                fingerprint = self._fingerprint(id_retailer)
+                index = (
+                    with_row_hashes(self._fetch(id_retailer))
+                    .select("key_hash", "value_hash")
+                    .unique("key_hash", keep="last")
+                )
+                self._write(id_retailer, index, fingerprint)
+            return index
+
+    def add(self, id_retailer: int, rows: pl.DataFrame) -> None:
+        """Catat baris yang baru tersimpan (value_hash lama ditimpa)"""
+        with self._lock:
+            index, _ = self._read(id_retailer)
+            if index is None:
+                # Index belum pernah dibangun: nanti dibangun dari database
+                return
+            index = pl.concat([index, rows.select("key_hash", "value_hash")]).unique(
+                "key_hash", keep="last"
+            )
+            self._write(id_retailer, index, self._fingerprint(id_retailer))
+
+    def invalidate(self, id_retailer: int) -> None:
+        """Buang index retailer (misalnya setelah insert yang gagal sebagian)"""
+        with self._lock:
+            for path in (self._path(id_retailer), self._meta_path(id_retailer)):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def plan(self, transactions: pl.DataFrame) -> Dict[str, pl.DataFrame]:
+        """
+        Bandingkan transaksi (hasil with_row_hashes) dengan index
+        Returns:
+            {"new": baris baru, "changed": key sama tapi nilai beda,
+             "unchanged": baris yang sudah tersimpan persis}
+        """
+        parts = {"new": [], "changed": [], "unchanged": []}
+        for (id_retailer,), rows in transactions.group_by(
+            "id_retailer", maintain_order=True
+        ):
+            index = self.get(id_retailer).rename({"value_hash": "_stored_hash"})
+            rows = rows.join(index, on="key_hash", how="left", maintain_order="left")
+            stored = pl.col("_stored_hash")
+            parts["new"].append(rows.filter(stored.is_null()))
+            parts["changed"].append(
+                rows.filter(stored.is_not_null() & (stored != pl.col("value_hash")))
+            )
+            parts["unchanged"].append(rows.filter(stored == pl.col("value_hash")))
+
+        empty = transactions.clear()
+        return {
+            name: (pl.concat(frames).drop("_stored_hash") if frames else empty)
+            for name, frames in parts.items()
+        }
+
+    @staticmethod
+    def _key_filter(row: Dict[str, Any]) -> str:
+        parts = []
+        for column, value in row.items():
+            if value is None:
+                parts.append(f"{column}.is.null")
+            else:
+                parts.append(f"{column}.eq.{value}")
+        return f"and({','.join(parts)})"
+
+    def stored_ids(self, rows: pl.DataFrame) -> List[int]:
+        """
+        id_transaction tersimpan dengan natural key yang sama (mode replace)
+        Dibaca sebelum insert; dihapus lewat delete_ids setelah insert berhasil
+        """
+        keys = rows.select(_canonical(KEY_COLUMNS)).unique().to_dicts()
+        ids = []
+        for start in range(0, len(keys), _KEY_FILTER_BATCH):
+            batch = keys[start : start + _KEY_FILTER_BATCH]
+            found = (
+                self.client.table("transaction")
+                .select("id_transaction")
+                .or_(",".join(self._key_filter(key) for key in batch))
+                .execute()
+                .data
+                or []
+            )
+            ids.extend(r["id_transaction"] for r in found)
+        return ids
+
+    def delete_ids(self, ids: List[int]) -> List[Dict[str, Any]]:
+        """
+        Hapus transaksi per id (satu request per _DELETE_BATCH id)
+        Returns:
+            Baris yang terhapus, seperti dikembalikan database
+        """
+        deleted = []
+        for start in range(0, len(ids), _DELETE_BATCH):
+            batch = ids[start : start + _DELETE_BATCH]
+            deleted.extend(
+                self.client.table("transaction")
+                .delete()
+                .in_("id_transaction", batch)
+                .execute()
+                .data
+                or []
+            )
+        return deleted
+
+    def stats(self) -> Dict[str, Any]:
+        retailers = 0
+        if os.path.isdir(self.directory):
+            retailers = sum(
+                1 for n in os.listdir(self.directory) if n.endswith(".arrow")
+            )
+        return {"retailers": retailers, "hash_version": HASH_VERSION}
+
+
+row_hash_index = RowHashIndex(
+    supabase, directory=os.path.join(settings.data_dir, "row_hashes")
+)
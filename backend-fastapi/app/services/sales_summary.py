@@ -0,0 +1,100 @@
+import polars as pl
+from datetime import date
+from typing import Any, Dict, Optional
+from app.config import settings
+from app.services.analytics_store import analytics_store
+from app.services.polars_service import PolarsDataProcessor
+
+SUMMARY_SOURCES = ("auto", "rollup", "store", "sql")
+
+
+class SalesSummaryService:
+    """
+    Ringkasan penjualan (orders, revenue, profit, AOV) tanpa menarik baris
+    - rollup: jumlahkan rollup cube (O(jumlah grup))
+    - store: scan Parquet lokal, partisi retailer/bulan dipangkas
+    - sql: agregasi dijalankan Postgres lewat DATABASE_URL
+    rollup/store menyertakan store_age_seconds (umur salinan lokal)
+    """
+
+    def summary(
+        self,
+        id_retailer: Optional[int] = None,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        source: str = "auto",
+    ) -> Dict[str, Any]:
+        if source not in SUMMARY_SOURCES:
+            raise ValueError(f"Source tidak dikenal: {source}")
+        if source == "auto":
+            source = self._auto_source()
+
+        if source == "sql":
+            return {**self._from_sql(id_retailer, start, end), "source": source}
+
+        freshness = analytics_store.ensure_fresh()
+        if source == "store":
+            result = PolarsDataProcessor.get_sales_summary(
+                analytics_store.scan(id_retailer, start, end)
+            )
+        else:
+            result = self._from_rollup(id_retailer, start, end)
+        return {**result, "source": source, **freshness}
+
+    @staticmethod
+    def _auto_source() -> str:
+        if analytics_store.exists():
+            return "rollup"
+        if settings.database_url:
+            return "sql"
+        # Belum ada salinan lokal: tarik sekali, selanjutnya cukup incremental
+        analytics_store.sync()
+        return "rollup"
+
+    @staticmethod
+    def _from_rollup(
+        id_retailer: Optional[int], start: Optional[date], end: Optional[date]
+    ) -> Dict[str, Any]:
+        totals = (
+            analytics_store.rollup()
+            .query(id_retailer=id_retailer, start=start, end=end)
+            .row(0, named=True)
+        )
+        return PolarsDataProcessor._summary_dict(
+            totals["transactions"], totals["total_sales"], totals["operating_profit"]
+        )
+
+    @staticmethod
+    def _from_sql(
+        id_retailer: Optional[int], start: Optional[date], end: Optional[date]
+    ) -> Dict[str, Any]:
+        # Import di sini: app.database butuh DATABASE_URL yang valid
+        from sqlalchemy import text
+        from app.database import get_bulk_engine
+
+        conditions, params = [], {}
+        if id_retailer is not None:
+            conditions.append("id_retailer = :id_retailer")
+            params["id_retailer"] = id_retailer
+        if start is not None:
+            conditions.append("invoice_date >= :start")
+            params["start"] = start
+        if end is not None:
+            conditions.append("invoice_date <= :end")
+            params["end"] = end
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        sql = text(
+            "SELECT COUNT(*) AS total_orders, "
+            "SUM(total_sales) AS total_revenue, "
+            "SUM(operating_profit) AS total_profit, "
+            "MIN(total_sales) AS min_order, "
+            "MAX(total_sales) AS max_order "
+            f'FROM "transaction" {where}'
+        )
+        with get_bulk_engine().connect() as conn:
+            row = conn.execute(sql, params).mappings().one()
+        return PolarsDataProcessor._summary_dict(**row)
+
+
+sales_summary = SalesSummaryService()
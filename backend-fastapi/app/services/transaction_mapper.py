@@ -0,0 +1,184 @@
+import polars as pl
+from typing import Any, Dict, List
+
+# tabel dimensi -> (kolom id, kolom nama, kolom hasil cleaning)
+DIMENSIONS = {
+    "city": ("id_city", "city", "City"),
+    "method": ("id_method", "method", "Sales Method"),
+    "product": ("id_product", "product", "Product"),
+    "retailer": ("id_retailer", "retailer_name", "Retailer"),
+}
+
+TRANSACTION_COLUMNS = [
+    "id_city",
+    "id_product",
+    "id_retailer",
+    "id_method",
+    "invoice_date",
+    "price_per_unit",
+    "unit_sold",
+    "total_sales",
+    "operating_profit",
+    "operating_margin",
+]
+
+# ID default kalau nama tidak ditemukan di tabel dimensi (method dibiarkan null)
+DEFAULT_IDS = {"city": 1, "product": 1, "retailer": 1, "method": None}
+
+# Dimensi yang anggota barunya boleh dibuat otomatis saat upload
+AUTO_CREATE_DIMENSIONS = ("city", "product", "retailer")
+# City baru tidak dibuat otomatis kecuali create_unknown_cities (id_state
+# tidak diketahui dan typo nama kota bisa jadi kota permanen)
+OPT_IN_DIMENSIONS = ("city",)
+
+
+class TransactionMapper:
+    """Mapping hasil cleaning ke baris tabel transaction pakai join Polars"""
+
+    @staticmethod
+    def dimension_frame(table: str, rows: List[Dict[str, Any]]) -> pl.DataFrame:
+        """Bangun frame (id, nama) dari hasil select tabel dimensi"""
+        id_col, name_col, _ = DIMENSIONS[table]
+        frame = pl.DataFrame(
+            [{id_col: r.get(id_col), name_col: r.get(name_col)} for r in rows],
+            schema={id_col: pl.Int64, name_col: pl.String},
+        )
+        # Sama seperti dict lama: nama duplikat memakai ID terakhir
+        return frame.drop_nulls(name_col).unique(
+            subset=name_col, keep="last", maintain_order=True
+        )
+
+    @staticmethod
+    def unknown_members(
+        df: pl.DataFrame,
+        dimensions: Dict[str, pl.DataFrame],
+        tables=AUTO_CREATE_DIMENSIONS,
+    ) -> Dict[str, List[str]]:
+        """
+        Nilai unik di hasil cleaning yang belum ada di tabel dimensi
+        (aturan cocoknya sama dengan map_transactions, termasuk fallback kota)
+        """
+        unknown = {}
+        for table in tables:
+            id_col, name_col, source = DIMENSIONS[table]
+            if source not in df.columns:
+                continue
+            dim = dimensions.get(table)
+            names = (
+                dim.get_column(name_col)
+                if dim is not None
+                else pl.Series(name_col, [], pl.String)
+            )
+
+            values = df.get_column(source).cast(pl.String).drop_nulls().unique()
+            missing = ~values.is_in(names)
+            if table == "city":
+                missing &= ~values.str.to_titlecase().is_in(names)
+            values = values.filter(missing & (values.str.strip_chars() != ""))
+            if len(values):
+                unknown[table] = values.sort().to_list()
+        return unknown
+
+    @staticmethod
+    def map_transactions(
+        df: pl.DataFrame, dimensions: Dict[str, pl.DataFrame]
+    ) -> pl.DataFrame:
+        """
+        Resolve ID dimensi dan bentuk kolom tabel transaction
+        Args:
+            df: DataFrame hasil AdidasCleaningService
+            dimensions: Dict {"city": frame, "method": frame, ...} dari dimension_frame
+        """
+        lf = df.lazy()
+        schema = lf.collect_schema()
+
+        # Kolom yang hilang diperlakukan sebagai null (dulu row.get(..., default))
+        source_cols = [source for _, _, source in DIMENSIONS.values()]
+        lf = lf.with_columns(
+            [
+                (
+                    pl.col(c).cast(pl.String)
+                    if c in schema
+                    else pl.lit(None, pl.String).alias(c)
+                )
+                for c in source_cols
+            ]
+            + [
+                pl.lit(None).alias(c)
+                for c in (
+                    "Invoice Date",
+                    "Price per Unit",
+                    "Units Sold",
+                    "Total Sales",
+                    "Operating Profit",
+                    "Operating Margin",
+                )
+                if c not in schema
+            ]
+        )
+
+        for table, (id_col, name_col, source) in DIMENSIONS.items():
+            dim = dimensions.get(table)
+            if dim is None:
+                dim = pl.DataFrame(schema={id_col: pl.Int64, name_col: pl.String})
+            dim = dim.lazy().select(
+                pl.col(name_col).alias(source), pl.col(id_col).alias(f"_{id_col}")
+            )
+            lf = lf.join(dim, on=source, how="left", maintain_order="left")
+
+            if table == "city":
+                # Fallback: nama kota dengan huruf kapital di awal kata
+                title = dim.select(
+                    pl.col(source).alias("_city_title"),
+                    pl.col(f"_{id_col}").alias("_id_city_title"),
+                )
+                lf = lf.with_columns(
+                    pl.col(source).str.to_titlecase().alias("_city_title")
+                ).join(title, on="_city_title", how="left", maintain_order="left")
+                resolved = pl.coalesce(pl.col(f"_{id_col}"), pl.col("_id_city_title"))
+            else:
+                resolved = pl.col(f"_{id_col}")
+
+            default = DEFAULT_IDS[table]
+            if default is not None:
+                resolved = resolved.fill_null(default)
+            lf = lf.with_columns(resolved.cast(pl.Int64).alias(id_col))
+
+        date_dtype = schema.get("Invoice Date", pl.Null)
+        if date_dtype == pl.Date:
+            invoice_date = pl.col("Invoice Date").dt.strftime("%Y-%m-%d")
+        elif isinstance(date_dtype, pl.Datetime):
+            invoice_date = pl.col("Invoice Date").dt.date().dt.strftime("%Y-%m-%d")
+        else:
+            invoice_date = pl.col("Invoice Date").cast(pl.String).str.slice(0, 10)
+
+        units = pl.col("Units Sold").cast(pl.Float64).cast(pl.Int64)
+
+        return (
+            lf.with_columns(
+                invoice_date.alias("invoice_date"),
+                pl.col("Price per Unit")
+                .cast(pl.Float64)
+                .fill_null(0)
+                .alias("price_per_unit"),
+                pl.when(units.is_null() | (units == 0))
+                .then(1)
+                .otherwise(units)
+                .alias("unit_sold"),
+                pl.col("Total Sales")
+                .cast(pl.Float64)
+                .fill_null(0)
+                .alias("total_sales"),
+                pl.col("Operating Profit")
+                .cast(pl.Float64)
+                .fill_null(0)
+                .alias("operating_profit"),
+                pl.col("Operating Margin")
+                .cast(pl.Float64)
+                .fill_null(0)
+                .alias("operating_margin"),
+            )
+            .filter(pl.col("total_sales") > 0)
+            .select(TRANSACTION_COLUMNS)
+            .collect()
+        )
@@ -0,0 +1,220 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+import polars as pl
+from typing import Any, Dict, Optional, Set, Tuple
+from app.config import settings
+from app.services.adidas_cleaning import AdidasCleaningService
+from app.services.dimension_cache import city_normalizer_or_none
+
+
+class CleanedUploadCache:
+    """
+    Cache hasil cleaning per SHA-256 isi file
+    - Frame disimpan sebagai Arrow IPC di disk, LRU berdasarkan waktu akses
+    - Cleaning yang sedang berjalan untuk file yang sama dipakai bersama
+    - Mencatat file yang sudah diupload untuk deteksi upload ganda
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._uploading: Set[str] = set()
+
+    @staticmethod
+    def digest(contents: bytes) -> str:
+        return hashlib.sha256(contents).hexdigest()
+
+    def _frame_path(self, digest: str) -> str:
+        version = AdidasCleaningService.CLEANING_VERSION
+        return os.path.join(self.directory, f"{digest}.v{version}.arrow")
+
+    def _report_path(self, digest: str) -> str:
+        return self._frame_path(digest)[: -len(".arrow")] + ".json"
+
+    def _marker_path(self, digest: str) -> str:
+        return os.path.join(self.directory, "uploaded", f"{digest}.json")
+
+    def get(self, digest: str) -> Optional[pl.DataFrame]:
+        """Ambil frame dari disk (dan tandai sebagai baru dipakai)"""
+        path = self._frame_path(digest)
+        try:
+            df = pl.read_ipc(path)
+            os.utime(path)
+        except (FileNotFoundError, OSError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return df
+
+    def get_report(self, digest: str) -> Optional[Dict[str, Any]]:
+        """Ringkasan cleaning (AdidasCleaningService.report) untuk entry ini"""
+        try:
+            with open(self._report_path(digest)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def put(
+        self, digest: str, df: pl.DataFrame, report: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """Simpan frame lalu buang entry paling lama kalau melebihi batas ukuran"""
+        os.makedirs(self.directory, exist_ok=True)
+        if report is not None:
+            with open(self._report_path(digest), "w") as f:
+                json.dump(report, f)
+        tmp_path = os.path.join(self.directory, f".{digest}.{uuid.uuid4().hex}.tmp")
+        df.write_ipc(tmp_path)
+        os.replace(tmp_path, self._frame_path(digest))
+        self._evict()
+
+    def _evict(self) -> None:
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.directory):
+                if not name.endswith(".arrow"):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, name in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                path = os.path.join(self.directory, name)
+                for entry in (path, path[: -len(".arrow")] + ".json"):
+                    try:
+                        os.remove(entry)
+                    except FileNotFoundError:
+                        pass
+                total -= size
+
+    async def _clean_and_store(
+        self, digest: str, contents: bytes, instrument: bool = False
+    ) -> pl.DataFrame:
+        city_normalizer = await asyncio.to_thread(city_normalizer_or_none)
+        cleaning_service = AdidasCleaningService(
+            db=None, instrument=instrument, city_normalizer=city_normalizer
+        )
+        df = await asyncio.to_thread(cleaning_service.process_bytes, contents)
+        await asyncio.to_thread(self.put, digest, df, cleaning_service.report())
+        return df
+
+    async def load(
+        self, contents: bytes, digest: Optional[str] = None, instrument: bool = False
+    ) -> Tuple[str, pl.DataFrame]:
+        """
+        Frame hasil cleaning untuk isi file ini; parsing hanya kalau belum ada
+        instrument=True: kalau cleaning jalan, waktu per tahap ikut disimpan di report
+        """
+        if digest is None:
+            digest = await asyncio.to_thread(self.digest, contents)
+
+        df = await asyncio.to_thread(self.get, digest)
+        if df is not None:
+            return digest, df
+        return digest, await self.clean(contents, digest, instrument)
+
+    async def clean(
+        self, contents: bytes, digest: str, instrument: bool = False
+    ) -> pl.DataFrame:
+        """
+        Cleaning penuh lalu simpan ke cache, tanpa cek cache lagi (dipakai
+        pemanggil yang sudah get() dan miss); ikut cleaning yang sedang jalan
+        """
+        task = self._inflight.get(digest)
+        if task is None:
+            task = asyncio.create_task(
+                self._clean_and_store(digest, contents, instrument)
+            )
+            self._inflight[digest] = task
+            task.add_done_callback(lambda _: self._inflight.pop(digest, None))
+        # shield: job yang dibatalkan tidak ikut membatalkan cleaning bersama
+        return await asyncio.shield(task)
+
+    def warm(self, contents: bytes, digest: str) -> bool:
+        """
+        Mulai cleaning penuh di background (dipakai preview cepat)
+        Hanya untuk file sampai preview_warm_max_mb; file besar baru diparse
+        penuh saat /upload
+        Returns:
+            True kalau cleaning background dimulai
+        """
+        if len(contents) > settings.preview_warm_max_mb * 1024 * 1024:
+            return False
+        task = asyncio.create_task(self.clean(contents, digest))
+        # Error cukup muncul lagi saat upload memanggil load()
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return True
+
+    def claim_upload(self, digest: str) -> Optional[Dict[str, Any]]:
+        """
+        Tandai file sedang diupload
+        Returns:
+            Info upload sebelumnya kalau file ini sudah pernah/sedang diupload
+        """
+        with self._lock:
+            if digest in self._uploading:
+                return {"status": "in_progress"}
+            info = self.uploaded_info(digest)
+            if info is None:
+                self._uploading.add(digest)
+            return info
+
+    def release_upload(
+        self, digest: str, info: Optional[Dict[str, Any]] = None, claimed: bool = True
+    ) -> None:
+        """Lepas klaim; simpan penanda kalau upload berhasil menyimpan data"""
+        if info is not None:
+            path = self._marker_path(digest)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                json.dump({**info, "uploaded_at": time.time()}, f)
+        if claimed:
+            with self._lock:
+                self._uploading.discard(digest)
+
+    def uploaded_info(self, digest: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._marker_path(digest)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def stats(self) -> Dict[str, Any]:
+        sizes = []
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith(".arrow"):
+                    try:
+                        sizes.append(
+                            os.path.getsize(os.path.join(self.directory, name))
+                        )
+                    except FileNotFoundError:
+                        pass
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0,
+            "entries": len(sizes),
+            "size_bytes": sum(sizes),
+            "max_bytes": self.max_bytes,
+        }
+
+
+upload_cache = CleanedUploadCache(
+    directory=os.path.join(settings.data_dir, "upload_cache"),
+    max_bytes=settings.upload_cache_max_mb * 1024 * 1024,
+)
@@ -0,0 +1,157 @@
+import asyncio
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+from app.config import settings
+from app.services.adidas_upload import AdidasUploadService, UploadProgress
+
+
+class UploadJob(UploadProgress):
+    """Status satu upload yang diproses di background"""
+
+    def __init__(
+        self, filename: str, contents: bytes, force: bool = False, mode: str = "append"
+    ):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.contents: Optional[bytes] = contents
+        self.force = force
+        self.mode = mode
+        self.status = "queued"  # queued, running, completed, failed, cancelled
+        self.stage = "queued"
+        self.rows_total = 0
+        self.rows_processed = 0
+        self.errors: List[str] = []
+        self.result: Optional[Dict[str, Any]] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def set_stage(self, stage: str) -> None:
+        self.stage = stage
+
+    def set_total(self, rows: int) -> None:
+        self.rows_total = rows
+
+    def set_processed(self, rows: int) -> None:
+        self.rows_processed = rows
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in ("completed", "failed", "cancelled")
+
+    def to_dict(self) -> Dict[str, Any]:
+        end = self.finished_at or time.time()
+        elapsed = end - self.started_at if self.started_at else 0
+        return {
+            "job_id": self.id,
+            "filename": self.filename,
+            "status": self.status,
+            "stage": self.stage,
+            "rows_total": self.rows_total,
+            "rows_processed": self.rows_processed,
+            "progress": (
+                round(self.rows_processed / self.rows_total * 100, 1)
+                if self.rows_total
+                else 0
+            ),
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_sec": round(self.rows_processed / elapsed, 1) if elapsed else 0,
+            "errors": self.errors,
+            "result": self.result,
+        }
+
+
+class UploadJobManager:
+    """Antrian upload in-process dengan jumlah worker (job bersamaan) terbatas"""
+
+    def __init__(self, max_concurrent: int = 2, retained: int = 200):
+        self.max_concurrent = max(1, max_concurrent)
+        self.retained = retained
+        self.jobs: Dict[str, UploadJob] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+
+    def _ensure_workers(self) -> None:
+        # Worker dibuat saat submit pertama karena butuh event loop yang jalan
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        self._workers = [w for w in self._workers if not w.done()]
+        while len(self._workers) < self.max_concurrent:
+            self._workers.append(asyncio.create_task(self._worker()))
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                if job.status == "queued":
+                    job.task = asyncio.create_task(self._run(job))
+                    try:
+                        await job.task
+                    except asyncio.CancelledError:
+                        if not job.task.cancelled():
+                            raise
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: UploadJob) -> None:
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            job.result = await AdidasUploadService(progress=job).run(
+                job.contents, filename=job.filename, force=job.force, mode=job.mode
+            )
+            failed = job.result.get("insert", {}).get("failed_batches", [])
+            job.errors.extend(b["error"] for b in failed)
+            job.status = "completed"
+            job.stage = "done"
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+            raise
+        except Exception as e:
+            job.status = "failed"
+            job.errors.append(getattr(e, "detail", None) or str(e))
+        finally:
+            job.finished_at = time.time()
+            job.contents = None
+
+    def _prune(self) -> None:
+        finished = [j for j in self.jobs.values() if j.is_finished]
+        for job in sorted(finished, key=lambda j: j.created_at)[
+            : max(0, len(self.jobs) - self.retained)
+        ]:
+            del self.jobs[job.id]
+
+    def submit(
+        self, filename: str, contents: bytes, force: bool = False, mode: str = "append"
+    ) -> UploadJob:
+        """Masukkan file ke antrian, langsung kembalikan job"""
+        self._ensure_workers()
+        self._prune()
+        job = UploadJob(filename, contents, force=force, mode=mode)
+        self.jobs[job.id] = job
+        self._queue.put_nowait(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[UploadJob]:
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[UploadJob]:
+        """Batalkan job; batch yang sudah tersimpan tidak di-rollback"""
+        job = self.jobs.get(job_id)
+        if job is None or job.is_finished:
+            return job
+        if job.status == "queued":
+            job.status = "cancelled"
+            job.finished_at = time.time()
+            job.contents = None
+        elif job.task is not None:
+            job.task.cancel()
+        return job
+
+
+upload_jobs = UploadJobManager(
+    max_concurrent=settings.upload_max_concurrent_jobs,
+    retained=settings.upload_jobs_retained,
+)
@@ -0,0 +1,123 @@
+import polars as pl
+from typing import Any, Dict, List, Optional
+from app.services.transaction_mapper import DIMENSIONS
+
+# Selisih relatif yang masih dianggap konsisten (pembulatan di Excel)
+CONSISTENCY_TOLERANCE = 0.01
+
+
+class UploadValidator:
+    """
+    Validasi baris hasil cleaning sebelum disimpan
+    - Tiap aturan adalah ekspresi boolean Polars (True = baris melanggar)
+    - Semua aturan dihitung dalam satu select: jumlah pelanggaran dan
+      contoh index baris (index di frame hasil cleaning, mulai 0)
+    - Sel yang gagal di-cast saat cleaning (report type_violation_rows)
+      jadi aturan <kolom>_wrong_type
+    """
+
+    def __init__(
+        self,
+        dimensions: Optional[Dict[str, pl.DataFrame]] = None,
+        sample_size: int = 5,
+    ):
+        self.dimensions = dimensions or {}
+        self.sample_size = sample_size
+
+    def rules(self, schema) -> Dict[str, pl.Expr]:
+        """Nama aturan -> ekspresi pelanggaran (kolom yang tidak ada dilewati)"""
+
+        def num(name):
+            return pl.col(name).cast(pl.Float64)
+
+        def off(actual, expected):
+            return (actual - expected).abs() > CONSISTENCY_TOLERANCE * expected.abs()
+
+        rules = {}
+        if "Invoice Date" in schema:
+            rules["invoice_date_invalid"] = pl.col("Invoice Date").is_null()
+        if "Total Sales" in schema:
+            # Baris ini dibuang saat mapping transaksi
+            rules["total_sales_not_positive"] = num("Total Sales").fill_null(0) <= 0
+        if "Price per Unit" in schema:
+            rules["price_not_positive"] = num("Price per Unit").fill_null(0) <= 0
+        if "Units Sold" in schema:
+            # Disimpan sebagai 1 saat mapping transaksi
+            rules["units_not_positive"] = num("Units Sold").fill_null(0) <= 0
+        if "Operating Margin" in schema:
+            rules["margin_out_of_range"] = ~num("Operating Margin").is_between(-1, 1)
+        if {"Total Sales", "Price per Unit", "Units Sold"} <= set(schema):
+            rules["sales_inconsistent"] = off(
+                num("Total Sales"), num("Price per Unit") * num("Units Sold")
+            )
+        if {"Total Sales", "Operating Profit", "Operating Margin"} <= set(schema):
+            rules["margin_inconsistent"] = off(
+                num("Operating Profit"), num("Total Sales") * num("Operating Margin")
+            )
+
+        for table, (_, name_col, source) in DIMENSIONS.items():
+            if source not in schema:
+                continue
+            value = pl.col(source).cast(pl.String)
+            rules[f"{table}_missing"] = value.is_null()
+            dim = self.dimensions.get(table)
+            if dim is None:
+                continue
+            names = dim.get_column(name_col).implode()
+            unknown = ~value.is_in(names)
+            if table == "city":
+                unknown &= ~value.str.to_titlecase().is_in(names)
+            rules[f"{table}_unknown"] = unknown.fill_null(False)
+
+        # Null (perbandingan dengan nilai kosong) dihitung sebagai lolos
+        return {name: expr.fill_null(False) for name, expr in rules.items()}
+
+    @staticmethod
+    def type_rules(type_violations: Dict[str, List[int]]) -> Dict[str, pl.Expr]:
+        """Aturan dari index baris yang nilainya hilang saat cast tipe"""
+        return {
+            f"{column.lower().replace(' ', '_')}_wrong_type": pl.int_range(
+                pl.len()
+            ).is_in(rows)
+            for column, rows in type_violations.items()
+        }
+
+    def validate(
+        self,
+        df: pl.DataFrame,
+        type_violations: Optional[Dict[str, List[int]]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Args:
+            type_violations: {kolom: index baris} dari report cleaning frame ini
+        Returns:
+            Dict dengan rows_checked, rows_invalid, dan per aturan
+            {"count": jumlah baris, "rows": contoh index baris}
+        """
+        rules = {**self.type_rules(type_violations or {}), **self.rules(df.schema)}
+        if not rules:
+            return {"rows_checked": len(df), "rows_invalid": 0, "rules": {}}
+
+        exprs = []
+        for name, expr in rules.items():
+            exprs.append(expr.sum().alias(f"{name}.count"))
+            exprs.append(
+                expr.arg_true().head(self.sample_size).implode().alias(f"{name}.rows")
+            )
+        exprs.append(pl.any_horizontal(list(rules.values())).sum().alias("invalid"))
+
+        # Satu select; ekspresi yang sama dipakai ulang lewat CSE
+        row = df.lazy().select(exprs).collect().row(0, named=True)
+
+        return {
+            "rows_checked": len(df),
+            "rows_invalid": row["invalid"],
+            "rules": {
+                name: {
+                    "count": row[f"{name}.count"],
+                    "rows": row[f"{name}.rows"],
+                }
+                for name in rules
+                if row[f"{name}.count"]
+            },
+        }
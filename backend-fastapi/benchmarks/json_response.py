@@ -0,0 +1,88 @@
+"""
+Benchmark serialisasi response DataFrame
+- legacy: df.to_dicts() -> jsonable_encoder -> json.dumps (jalur FastAPI default)
+- polars: PolarsJSONResponse (write_json + orjson)
+
+Jalankan dari folder backend-fastapi:
+    python -m benchmarks.json_response --rows 100000
+"""
+
+import argparse
+import json
+import time
+from datetime import date, datetime, timedelta
+
+import polars as pl
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.responses import PolarsJSONResponse
+
+
+def sample_frame(rows: int) -> pl.DataFrame:
+    """Frame dengan kolom seperti hasil cleaning Adidas (+ timestamp)"""
+    return pl.DataFrame(
+        {
+            "Retailer": ["Transmart"] * rows,
+            "Invoice Date": pl.date_range(
+                date(2020, 1, 1),
+                date(2020, 1, 1) + timedelta(days=rows - 1),
+                eager=True,
+            ),
+            "Product": ["Men's Street Footwear", "Women's Apparel"] * (rows // 2)
+            + ["Men's Athletic Footwear"] * (rows % 2),
+            "Price per Unit": [50.0 + i % 25 for i in range(rows)],
+            "Units Sold": [1200 + i % 300 for i in range(rows)],
+            "Total Sales": [60000.0 + i for i in range(rows)],
+            "Operating Profit": [30000.5 + i for i in range(rows)],
+            "Operating Margin": [0.5] * rows,
+            "Sales Method": ["In-store", "Outlet"] * (rows // 2)
+            + ["Online"] * (rows % 2),
+            "City": ["Medan"] * rows,
+            # Detik pecahan tidak selalu ada: format ISO keduanya harus sama
+            "Created At": pl.datetime_range(
+                datetime(2020, 1, 1),
+                datetime(2020, 1, 1) + timedelta(milliseconds=500 * (rows - 1)),
+                interval="500ms",
+                eager=True,
+            ),
+        }
+    )
+
+
+def legacy(df: pl.DataFrame) -> bytes:
+    content = jsonable_encoder({"status": "success", "preview": df.to_dicts()})
+    return JSONResponse(content).body
+
+
+def fast(df: pl.DataFrame) -> bytes:
+    return PolarsJSONResponse({"status": "success", "preview": df}).body
+
+
+def best_of(fn, df: pl.DataFrame, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(df)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'legacy (s)':>11} {'polars (s)':>11} {'speedup':>8}")
+    for rows in args.rows:
+        df = sample_frame(rows)
+        # Hasil harus sama secara isi
+        assert json.loads(legacy(df)) == json.loads(fast(df))
+        slow_s = best_of(legacy, df, args.repeat)
+        fast_s = best_of(fast, df, args.repeat)
+        print(f"{rows:>8} {slow_s:>11.4f} {fast_s:>11.4f} {slow_s / fast_s:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -353,9 +353,9 @@ export default function UploadPage() {
         formData.append('method', selectedFilters.method)
       }
 
-      setUploadProgress(50)
+      setUploadProgress(30)
       
-      const res = await fetch(`${backendUrl}/api/v1/adidas/upload`, {
+      const res = await fetch(`${backendUrl}/api/v1/adidas/jobs`, {
         method: 'POST',
         body: formData
       })
@@ -365,9 +365,29 @@ export default function UploadPage() {
         throw new Error(`Upload failed: ${errorText}`)
       }
       
-      const data = await res.json()
-      console.log('Upload response:', data)
-      
+      const { job_id: jobId } = await res.json()
+
+      // Poll status job sampai selesai (upload besar tidak kena timeout proxy)
+      let job: any = null
+      while (true) {
+        await new Promise(resolve => setTimeout(resolve, 1000))
+        const statusRes = await fetch(`${backendUrl}/api/v1/adidas/jobs/${jobId}`)
+        if (!statusRes.ok) {
+          throw new Error(`Gagal cek status upload: ${await statusRes.text()}`)
+        }
+        job = (await statusRes.json()).job
+        if (job.rows_total > 0) {
+          setUploadProgress(30 + Math.round(job.progress * 0.7))
+        }
+        if (['completed', 'failed', 'cancelled'].includes(job.status)) break
+      }
+      console.log('Upload job:', job)
+
+      if (job.status !== 'completed') {
+        throw new Error(job.errors?.[0] || `Upload ${job.status}`)
+      }
+
+      const data = job.result
       setUploadProgress(100)
       setResult({
         success: data.status === 'success',
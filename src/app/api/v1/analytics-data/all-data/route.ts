@@ -1,8 +1,53 @@
 import { NextRequest, NextResponse } from 'next/server'
 import { supabase } from '@/lib/supabase'
 
+// Halaman transaksi dari backend (keyset pagination, sudah berisi nama dimensi)
+async function fetchBackendTransactions(limit: number): Promise<any[] | null> {
+  const backendUrl = process.env.NEXT_PUBLIC_BACKEND_URL || 'http://localhost:8000'
+  try {
+    const rows: any[] = []
+    let cursor: string | null = null
+    do {
+      const params = new URLSearchParams({ limit: String(Math.min(limit - rows.length, 10000)) })
+      if (cursor) params.set('cursor', cursor)
+      const res = await fetch(`${backendUrl}/api/v1/analytics/transactions?${params}`, {
+        cache: 'no-store',
+      })
+      if (!res.ok) return null
+      const page = await res.json()
+      rows.push(...page.data)
+      cursor = page.next_cursor
+    } while (cursor && rows.length < limit)
+    return rows
+  } catch (backendError) {
+    console.warn('Transactions backend unavailable, falling back to Supabase:', backendError)
+    return null
+  }
+}
+
 export async function GET(req: NextRequest) {
   try {
+    // null = backend/store tidak tersedia (404); kosong juga fallback ke Supabase
+    const backendRows = await fetchBackendTransactions(10000)
+    if (backendRows && backendRows.length > 0) {
+      const [{ count: retailers }, { count: products }, { count: cities }] = await Promise.all([
+        supabase.from('retailer').select('*', { count: 'exact', head: true }),
+        supabase.from('product').select('*', { count: 'exact', head: true }),
+        supabase.from('city').select('*', { count: 'exact', head: true }),
+      ])
+      const data = backendRows.map((t: any) => ({ ...t, order_count: 1 }))
+      return NextResponse.json({
+        success: true,
+        data: data,
+        stats: {
+          transactions: data.length,
+          retailers: retailers || 0,
+          products: products || 0,
+          cities: cities || 0
+        }
+      })
+    }
+
     const { data: transactions, error } = await supabase
       .from('transaction')
       .select(`
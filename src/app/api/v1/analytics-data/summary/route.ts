@@ -16,6 +16,30 @@ export async function GET(req: NextRequest) {
     
     const isSuperAdmin = userRole === 'GM' || userRole === 'ADMIN_PUSAT'
 
+    // Agregasi dijalankan di backend (rollup/Postgres), hanya angka yang dikirim
+    const backendUrl = process.env.NEXT_PUBLIC_BACKEND_URL || 'http://localhost:8000'
+    const params = new URLSearchParams()
+    if (!isSuperAdmin && userRestaurantId) {
+      params.set('id_retailer', String(parseInt(userRestaurantId)))
+    }
+    try {
+      const res = await fetch(`${backendUrl}/api/v1/analytics/summary?${params}`, {
+        cache: 'no-store',
+      })
+      if (res.ok) {
+        const summary = await res.json()
+        return NextResponse.json({
+          success: true,
+          total_orders: summary.total_orders,
+          total_revenue: summary.total_revenue,
+          total_profit: summary.total_profit,
+          avg_order_value: summary.avg_order_value
+        })
+      }
+    } catch (backendError) {
+      console.warn('Summary backend unavailable, falling back to Supabase:', backendError)
+    }
+
     let query = supabase
       .from('transaction')
       .select('*')
@@ -111,6 +111,14 @@ CREATE INDEX IF NOT EXISTS idx_transaction_id_product ON transaction(id_product)
 CREATE INDEX IF NOT EXISTS idx_transaction_id_method ON transaction(id_method);
 CREATE INDEX IF NOT EXISTS idx_transaction_id_city ON transaction(id_city);
 
+-- Nama dimensi unik (dipakai upsert anggota baru saat upload)
+-- CATATAN: CREATE UNIQUE INDEX gagal kalau tabel sudah berisi nama duplikat.
+-- Cek dulu dan gabungkan duplikatnya sebelum menjalankan bagian ini, misalnya:
+--   SELECT city, COUNT(*) FROM city GROUP BY city HAVING COUNT(*) > 1;
+CREATE UNIQUE INDEX IF NOT EXISTS uq_city_city ON city(city);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_retailer_retailer_name ON retailer(retailer_name);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_product_product ON product(product);
+
 -- Enable Row Level Security
 ALTER TABLE users ENABLE ROW LEVEL SECURITY;
 ALTER TABLE state ENABLE ROW LEVEL SECURITY;